@@ -0,0 +1,183 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, current_app, request
+
+import facets
+import queries
+from cache import detail_cache, venue_key, artist_key
+from conditional import conditional
+from models import Artist, Venue
+from query_budget import query_budget
+from typeahead import typeahead
+
+try:
+    # Optional, several times faster than json for large lists
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Detail fields built from the shows rather than from a column
+show_fields = ('past_shows', 'upcoming_shows')
+
+
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """Serialize ``payload`` to compact JSON, datetimes as ISO 8601 strings."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), default=_default)
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def requested_fields(available):
+    """Return the fields listed in ``?fields=``, all of ``available`` when absent."""
+    if not request.args.get('fields'):
+        return tuple(available)
+    names = (field.strip() for field in request.args['fields'].split(','))
+    fields = tuple(dict.fromkeys(field for field in names if field))
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        abort(400, f"Unknown fields: {', '.join(unknown)}" if unknown else 'No fields requested.')
+    return fields
+
+
+def requested_limit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    if limit < 1:
+        abort(400, 'limit must be positive.')
+    return min(limit, current_app.config['API_MAX_PAGE_SIZE'])
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def error(error):
+    return json_response({'error': error.description}, status=error.code)
+
+
+# ----------------------------------------------------------------------------#
+# Venues and artists.
+# ----------------------------------------------------------------------------#
+# The lists page through the rows in id order, the next page starting after the
+# id returned in "next". ?genre=&state= filter them, and the first page holds the
+# row counts of every genre and state in "facets", which read the whole table.
+# SQLite explains the walk of the first page along the rowid as a scan, hence the
+# seq_scans of the lists. Details served with past or upcoming shows come from the
+# same cached payload as the HTML pages.
+
+def _catalog_list(model):
+    fields = requested_fields(queries.catalog_columns(model))
+    after = request.args.get('after', type=int)
+    try:
+        selected = facets.parse_selected(request.args)
+    except ValueError as error:
+        abort(400, str(error))
+    conditions = facets.facet_conditions(model, selected).values()
+    rows, next_after = queries.catalog_page(model, fields, after=after, limit=requested_limit(),
+                                            conditions=conditions)
+    payload = {'data': rows, 'next': next_after}
+    if after is None:
+        payload['facets'] = facets.facet_counts(model, selected)
+    return json_response(payload)
+
+
+def _catalog_detail(model, row_id, cache_key, loader):
+    fields = requested_fields(tuple(queries.catalog_columns(model)) + show_fields)
+    if any(field in show_fields for field in fields):
+        detail = detail_cache.get_or_load(cache_key, loader)
+        data = queries.split_shows(detail, datetime.now()) if detail is not None else None
+    else:
+        data = queries.catalog_row(model, row_id, fields)
+    if data is None:
+        abort(404, f'No {model.__tablename__} with id {row_id}.')
+    return json_response({'data': {field: data[field] for field in fields}})
+
+
+@api.route('/venues')
+@query_budget(3, seq_scans=['venue'])
+@conditional('venue')
+def venues():
+    return _catalog_list(Venue)
+
+
+@api.route('/venues/<int:venue_id>')
+@query_budget(3)
+@conditional('venue', 'show', 'artist', time_bucket='CONDITIONAL_GET_TIME_BUCKET')
+def venue(venue_id):
+    return _catalog_detail(Venue, venue_id, venue_key(venue_id),
+                           lambda: queries.venue_detail(venue_id))
+
+
+@api.route('/artists')
+@query_budget(3, seq_scans=['artist'])
+@conditional('artist')
+def artists():
+    return _catalog_list(Artist)
+
+
+@api.route('/artists/<int:artist_id>')
+@query_budget(3)
+@conditional('artist', 'show', 'venue', time_bucket='CONDITIONAL_GET_TIME_BUCKET')
+def artist(artist_id):
+    return _catalog_detail(Artist, artist_id, artist_key(artist_id),
+                           lambda: queries.artist_detail(artist_id))
+
+
+# ----------------------------------------------------------------------------#
+# Shows.
+# ----------------------------------------------------------------------------#
+@api.route('/shows')
+@query_budget(2)
+@conditional('show', 'venue', 'artist', time_bucket='CONDITIONAL_GET_TIME_BUCKET')
+def shows():
+    # upcoming shows, or the shows of the ?from=&to= range, in start time order. The next
+    # page starts after the "next" cursor, sent along with the same range
+    fields = requested_fields(queries.show_columns)
+    try:
+        after = queries.decode_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        abort(400, 'Malformed cursor.')
+    try:
+        start, end = queries.decode_range(request.args.get('from'), request.args.get('to'))
+    except ValueError as error:
+        abort(400, f'Malformed range: {error}')
+    rows, next_cursor = queries.show_page(datetime.now(), after=after, limit=requested_limit(),
+                                          fields=fields, start=start, end=end)
+    return json_response({'data': rows, 'next': next_cursor})
+
+
+# ----------------------------------------------------------------------------#
+# Typeahead.
+# ----------------------------------------------------------------------------#
+# Names starting with ?q=, accents and case ignored, served from the in-process
+# indexes of typeahead.py. Only the first request of a process, which loads the
+# index by reading every name of the table, issues SQL.
+
+def _typeahead(table):
+    results = typeahead.search(table, request.args.get('q', ''), current_app.config['TYPEAHEAD_RESULTS'])
+    return json_response({'data': [{'id': row_id, 'name': name} for row_id, name in results]})
+
+
+@api.route('/venues/typeahead')
+@query_budget(2, seq_scans=['venue'])
+def venue_typeahead():
+    return _typeahead('venue')
+
+
+@api.route('/artists/typeahead')
+@query_budget(2, seq_scans=['artist'])
+def artist_typeahead():
+    return _typeahead('artist')
@@ -2,14 +2,15 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import json
 import logging
 import os
 import sys
-from collections import defaultdict
+import time
+from datetime import timedelta
 from logging import Formatter, FileHandler
 
-import babel
-import dateutil.parser
+import click
 from flask import (
     Flask,
     render_template,
@@ -17,22 +18,49 @@ from flask import (
     flash,
     redirect,
     url_for,
-    abort
+    abort,
+    Response,
+    stream_with_context
 )
 from flask_migrate import Migrate
 from flask_moment import Moment
 from flask_wtf import CSRFProtect
 
+import benchmark
+import bookings
+import counters
+import deletes
+import exporter
+import facets
+import formatting
+import importer
 import models
+import partitions
+import queries
+import search
+import seed
+from loading import profile
 from forms import *
+from api import api
+from async_reads import async_reads
+from assets import assets
+from compression import compression
 from models import db, Artist, Show, Venue
+from cache import detail_cache, venue_key, artist_key
+from conditional import conditional
+from metrics import metrics
+from pool import pool_guard
+from routing import replica_router, read_only, writes
+from typeahead import typeahead
+from query_budget import query_budget, check_query_budgets
+from explain import check_query_plans
 
 
 # Debugging Functions
 def error_line_number():
     exc_type, exc_obj, exc_tb = sys.exc_info()
     fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
-    return print(exc_type, fname, exc_tb.tb_lineno)
+    app.logger.error('%s %s %s', exc_type, fname, exc_tb.tb_lineno)
 
 
 # ----------------------------------------------------------------------------#
@@ -44,81 +72,64 @@ app.config.from_object('config')
 db.init_app(app)
 migrate = Migrate(app, db)
 csrf.init_app(app)
+detail_cache.init_app(app)
+typeahead.init_app(app)
+metrics.init_app(app)
+replica_router.init_app(app)
+pool_guard.init_app(app)
+compression.init_app(app)
+app.register_blueprint(api)
+app.register_blueprint(async_reads)
+assets.init_app(app)
+# Compiled templates are shared by the workers through TEMPLATE_CACHE_DIR
+if app.config['TEMPLATE_CACHE_DIR']:
+    app.jinja_env.bytecode_cache = formatting.bytecode_cache(app.config['TEMPLATE_CACHE_DIR'])
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
-def format_datetime(value, format='medium'):
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-    else:
-        date = value
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
-
-
-app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.filters['datetime'] = formatting.format_datetime
+app.jinja_env.filters['show_times'] = formatting.format_show_times
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 @app.route('/')
+@query_budget(0)
 def index():
     return render_template('pages/home.html')
 
 
 #  Venues
 #  ----------------------------------------------------------------
+# The facet counts read every venue, the filtered list uses the genre and state indexes
 @app.route('/venues')
+@query_budget(4, seq_scans=['venue'])
+@conditional('venue')
 def venues():
+    # ?genre=&state= keep the venues of any of the given genres and states, repeatable
     error = False
     data = []
-    # Dictionary mapping venue_id to num_upcoming_shows
-    upcoming_shows = defaultdict(int)
-    current_datetime = datetime.now()
+    has_next = False
+    options = {}
+    page = request.args.get('page', 1, type=int)
+    if page < 1:
+        page = 1
     try:
-        # Retrieve a list of all the Venues
-        venues_list = Venue().query.all()
-
-        # Define a list of location tuples
-        locations = []
-        for venue in venues_list:
-            locations.append((venue.city, venue.state))
-        # Make the list hold only unique values
-        locations = list(dict.fromkeys(locations))
-
-        # Determine the number of upcoming shows per venue
-        upcoming_shows_list = Show().query.filter(Show.start_time > current_datetime)
-        for show in upcoming_shows_list:
-            upcoming_shows[show.venue_id] += 1
-
-        # Add all of the locations to data
-        for location in locations:
-            data.append(
-                {
-                    "city": location[0],
-                    "state": location[1],
-                    "venues": list(defaultdict())
-                }
-            )
-
-        # Iterate through venues to match them to their locations
-        for venue in venues_list:
-            for i, location in enumerate(locations):
-                # If the location matches, add venue data to that location record
-                if data[i]['city'] == venue.city and data[i]['state'] == venue.state:
-                    data[i]['venues'].append(
-                        {
-                            'id': venue.id,
-                            'name': venue.name,
-                            'num_upcoming_shows': upcoming_shows[venue.id]
-                        }
-                    )
+        selected = facets.parse_selected(request.args)
+    except ValueError:
+        abort(400)
+    try:
+        conditions = facets.facet_conditions(Venue, selected).values()
+        # Group the venues of this page of areas with their upcoming show counts
+        data, has_next = queries.venue_areas(
+            page=page,
+            per_page=app.config['AREAS_PER_PAGE'],
+            conditions=conditions
+        )
+        options = facets.facet_options(facets.facet_counts(Venue, selected), selected)
     except:
         error = True
         error_line_number()
@@ -127,44 +138,23 @@ def venues():
     if error:
         abort(500)
     else:
-        return render_template('pages/venues.html', areas=data)
+        return render_template('pages/venues.html', areas=data, page=page, has_next=has_next,
+                               facets=options, selected=selected)
 
 
 @app.route('/venues/search', methods=['POST'])
+@read_only
+@query_budget(1)
 def search_venues():
     # search for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     error = False
     response = {}
-    # Dictionary mapping venue_id to num_upcoming_shows
-    upcoming_shows = defaultdict(int)
-    current_datetime = datetime.now()
     try:
-        form_data = request.form.items()
-        search_value = ""
-        for item in form_data:
-            search_value = item[1]
-        search_results = Venue().query.filter(Venue.name.ilike(f'%{search_value}%')).all()
-
-        venue_data = []
-        for venue in search_results:
-
-            # Determine the number of upcoming shows per venue
-            upcoming_shows_list = Show().query.filter(Show.start_time > current_datetime)
-            for show in upcoming_shows_list:
-                upcoming_shows[show.venue_id] += 1
-
-            venue_data.append(
-                {
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": upcoming_shows[venue.id]
-                }
-            )
-        response = {
-            "count": len(search_results),
-            "data": venue_data
-        }
+        response = search.search_venues(
+            request.form.get('search_term', ''),
+            limit=app.config['SEARCH_RESULTS_LIMIT']
+        )
     except:
         error = True
         db.session.rollback()
@@ -179,59 +169,29 @@ def search_venues():
 
 
 @app.route('/venues/<int:venue_id>')
+@query_budget(3)
+@conditional('venue', 'show', 'artist', time_bucket=app.config['CONDITIONAL_GET_TIME_BUCKET'])
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     error = False
-    response = {}
+    data = {}
     current_datetime = datetime.now()
-    past_shows = []
-    upcoming_shows = []
     try:
-        # Get the information about the Venue
-        venue = Venue().query.get(venue_id)
-
-        for show in venue.shows:
-            show_data = {
-                "artist_id": show.artist.id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time
-            }
-            if show.start_time <= current_datetime:
-                past_shows.append(show_data)
-            else:
-                upcoming_shows.append(show_data)
-
-        # Build the data object of the venue
-        data = {
-            "id": venue.id,
-            "name": venue.name,
-            "genres": venue.genres,
-            "address": venue.address,
-            "city": venue.city,
-            "state": venue.state,
-            "phone": venue.phone,
-            "website": venue.website,
-            "facebook_link": venue.facebook_link,
-            "seeking_talent": venue.seeking_talent,
-            "seeking_description": venue.seeking_description,
-            "image_link": venue.image_link,
-            "past_shows": past_shows,
-            "upcoming_shows": upcoming_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows_count": len(upcoming_shows)
-        }
-
-        response['venue_id'] = venue.id
-        response['venue_name'] = venue.name
+        # Get the information about the Venue and its shows, cached between edits
+        venue = detail_cache.get_or_load(venue_key(venue_id), lambda: queries.venue_detail(venue_id))
+        if venue is not None:
+            data = queries.split_shows(venue, current_datetime)
     except:
         error = True
         error_line_number()
         flash(f'Something went wrong! Could not find Venue with id: {venue_id}...')
+    finally:
+        db.session.close()
     if error:
         abort(500)
+    elif not data:
+        abort(404)
     else:
-        print(response)
         return render_template('pages/show_venue.html', venue=data)
 
 
@@ -269,7 +229,7 @@ def create_venue_submission():
         if error:
             abort(500)
         else:
-            print(response)
+            app.logger.debug(response)
             try:
                 # on successful db insert, flash success
                 flash('Venue ' + response['venue_name'] + ' was successfully listed!')
@@ -282,47 +242,80 @@ def create_venue_submission():
         return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>/delete')
+@app.route('/venues/<int:venue_id>/delete')
+@writes
 def delete_venue(venue_id):
+    # deletes the venue and, through ON DELETE CASCADE, its shows in one statement
     error = False
     response = {}
     try:
-        venue = Venue().query.get(venue_id)
-        venue_shows = Show().query.filter(Show.venue_id == venue.id).all()
-        artists_with_shows_at_venue = []
-        for show in venue_shows:
-            artists_with_shows_at_venue.append(show.artist_id)
-        artists_with_shows_at_venue = list(dict.fromkeys(artists_with_shows_at_venue))
-        print(venue)
-        print(venue_shows)
-        print(artists_with_shows_at_venue)
-        db.session.delete(venue)
-        db.session.commit()
-        response['deleted'] = True
-        response['venue_id'] = venue_id
-        response['venue_name'] = venue.name
+        response['venue_name'] = db.session.query(Venue.name).filter(Venue.id == venue_id).scalar()
+        if response['venue_name'] is not None:
+            deleted, response['show_count'] = deletes.delete_catalog_rows(db.session, Venue, [venue_id])
     except:
         error = True
         db.session.rollback()
         error_line_number()
-        flash(f"Something went wrong when deleting Venue with id: {response['venue_id']}...")
+        flash(f"Something went wrong when deleting Venue with id: {venue_id}...")
     finally:
         db.session.close()
     if error:
         abort(500)
+    elif response['venue_name'] is None:
+        abort(404)
     else:
-        flash(f"Successfully deleted Venue '{response['venue_name']}'!")
+        flash(f"Successfully deleted Venue '{response['venue_name']}' and its {response['show_count']} shows!")
+    return render_template('pages/home.html')
+
+
+@app.route('/venues/delete', methods=['POST'])
+def delete_venues():
+    # deletes every venue listed in the ids field in one statement
+    return bulk_delete(Venue, 'Venues')
+
+
+def bulk_delete(model, name):
+    # ids are posted as repeated fields, comma separated values, or both
+    try:
+        ids = [int(value) for field in request.form.getlist('ids') for value in field.split(',') if value.strip()]
+    except ValueError:
+        abort(400)
+    if not ids:
+        abort(400)
+    error = False
+    deleted, show_count = [], 0
+    try:
+        deleted, show_count = deletes.delete_catalog_rows(db.session, model, ids)
+    except:
+        error = True
+        db.session.rollback()
+        error_line_number()
+        flash(f'Something went wrong when deleting {len(ids)} {name}...')
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    flash(f'Deleted {len(deleted)} {name} and their {show_count} shows, {len(set(ids)) - len(deleted)} ids not found.')
     return render_template('pages/home.html')
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@query_budget(3, seq_scans=['artist'])
+@conditional('artist')
 def artists():
+    # ?genre=&state= keep the artists of any of the given genres and states, repeatable
     error = False
     data = []
+    options = {}
+    try:
+        selected = facets.parse_selected(request.args)
+    except ValueError:
+        abort(400)
     try:
-        artists_list = Artist().query.all()
+        conditions = facets.facet_conditions(Artist, selected).values()
+        artists_list = Artist().query.options(*profile(Artist, 'list')).filter(*conditions).all()
         for artist in artists_list:
             data.append(
                 {
@@ -330,6 +323,7 @@ def artists():
                     "name": artist.name
                 }
             )
+        options = facets.facet_options(facets.facet_counts(Artist, selected), selected)
     except:
         error = True
         error_line_number()
@@ -338,44 +332,22 @@ def artists():
     if error:
         abort(500)
     else:
-        return render_template('pages/artists.html', artists=data)
+        return render_template('pages/artists.html', artists=data, facets=options, selected=selected)
 
 
 @app.route('/artists/search', methods=['POST'])
+@read_only
+@query_budget(1)
 def search_artists():
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     error = False
     response = {}
-    # Dictionary mapping venue_id to num_upcoming_shows
-    upcoming_shows = defaultdict(int)
-    current_datetime = datetime.now()
     try:
-        form_data = request.form.items()
-        search_value = ""
-        for item in form_data:
-            search_value = item[1]
-        search_results = Artist().query.filter(Artist.name.ilike(f'%{search_value}%')).all()
-
-        artist_data = []
-        for artist in search_results:
-
-            # Determine the number of upcoming shows per venue
-            upcoming_shows_list = Show().query.filter(Show.start_time > current_datetime)
-            for show in upcoming_shows_list:
-                upcoming_shows[show.artist_id] += 1
-
-            artist_data.append(
-                {
-                    "id": artist.id,
-                    "name": artist.name,
-                    "num_upcoming_shows": upcoming_shows[artist.id]
-                }
-            )
-        response = {
-            "count": len(search_results),
-            "data": artist_data
-        }
+        response = search.search_artists(
+            request.form.get('search_term', ''),
+            limit=app.config['SEARCH_RESULTS_LIMIT']
+        )
     except:
         error = True
         db.session.rollback()
@@ -390,46 +362,18 @@ def search_artists():
 
 
 @app.route('/artists/<int:artist_id>')
+@query_budget(3)
+@conditional('artist', 'show', 'venue', time_bucket=app.config['CONDITIONAL_GET_TIME_BUCKET'])
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     error = False
-    data = defaultdict
+    data = {}
     current_datetime = datetime.now()
-    past_shows = []
-    upcoming_shows = []
     try:
-        # Get a list of all the Artist
-        artist = Artist().query.get(artist_id)
-
-        for show in artist.shows:
-            show_data = {
-                "artist_id": show.artist.id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time
-            }
-            if show.start_time <= current_datetime:
-                past_shows.append(show_data)
-            else:
-                upcoming_shows.append(show_data)
-        # Build the data object of the artist information
-        data = {
-            "id": artist.id,
-            "name": artist.name,
-            "genres": artist.genres,
-            "city": artist.city,
-            "state": artist.state,
-            "phone": artist.phone,
-            "website": artist.website,
-            "facebook_link": artist.facebook_link,
-            "seeking_venue": artist.seeking_venue,
-            "seeking_description": artist.seeking_description,
-            "image_link": artist.image_link,
-            "past_shows": past_shows,
-            "upcoming_shows": upcoming_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows_count": len(upcoming_shows)
-        }
+        # Get the information about the Artist and its shows, cached between edits
+        artist = detail_cache.get_or_load(artist_key(artist_id), lambda: queries.artist_detail(artist_id))
+        if artist is not None:
+            data = queries.split_shows(artist, current_datetime)
     except:
         error = True
         error_line_number()
@@ -437,17 +381,52 @@ def show_artist(artist_id):
         db.session.close()
     if error:
         abort(500)
+    elif not data:
+        abort(404)
     else:
         return render_template('pages/show_artist.html', artist=data)
 
 
+@app.route('/artists/<int:artist_id>/delete')
+@writes
+def delete_artist(artist_id):
+    # deletes the artist and, through ON DELETE CASCADE, its shows in one statement
+    error = False
+    response = {}
+    try:
+        response['artist_name'] = db.session.query(Artist.name).filter(Artist.id == artist_id).scalar()
+        if response['artist_name'] is not None:
+            deleted, response['show_count'] = deletes.delete_catalog_rows(db.session, Artist, [artist_id])
+    except:
+        error = True
+        db.session.rollback()
+        error_line_number()
+        flash(f"Something went wrong when deleting Artist with id: {artist_id}...")
+    finally:
+        db.session.close()
+    if error:
+        abort(500)
+    elif response['artist_name'] is None:
+        abort(404)
+    else:
+        flash(f"Successfully deleted Artist '{response['artist_name']}' and its {response['show_count']} shows!")
+    return render_template('pages/home.html')
+
+
+@app.route('/artists/delete', methods=['POST'])
+def delete_artists():
+    # deletes every artist listed in the ids field in one statement
+    return bulk_delete(Artist, 'Artists')
+
+
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@query_budget(1)
 def edit_artist(artist_id):
     error = False
     try:
-        artist = Artist().query.get(artist_id)
+        artist = Artist().query.options(*profile(Artist, 'edit')).get(artist_id)
         form = ArtistForm(obj=artist)
     except:
         error = True
@@ -472,6 +451,7 @@ def edit_artist_submission(artist_id):
             form.populate_obj(artist)
             db.session.add(artist)
             db.session.commit()
+            detail_cache.invalidate_artist(artist_id)
         except:
             error = True
             db.session.rollback()
@@ -484,17 +464,18 @@ def edit_artist_submission(artist_id):
             flash("Artist updatd!")
             return redirect(url_for('show_artist', artist_id=artist_id))
     else:
-        print(form.errors.items())
+        app.logger.debug(form.errors.items())
         for error in form.errors.items():
             flash(f"Error editing Artist. Field {error[0]} has error: {error[1][0]}")
         return render_template('pages/home.html')
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@query_budget(1)
 def edit_venue(venue_id):
     error = False
     try:
-        venue = Venue().query.get(venue_id)
+        venue = Venue().query.options(*profile(Venue, 'edit')).get(venue_id)
         form = VenueForm(obj=venue)
     except:
         error = True
@@ -518,6 +499,7 @@ def edit_venue_submission(venue_id):
             form.populate_obj(venue)
             db.session.add(venue)
             db.session.commit()
+            detail_cache.invalidate_venue(venue_id)
         except:
             error = True
             error_line_number()
@@ -529,7 +511,7 @@ def edit_venue_submission(venue_id):
             flash("Venue updated!")
             return redirect(url_for('show_venue', venue_id=venue_id))
     else:
-        print(form.errors.items())
+        app.logger.debug(form.errors.items())
         for error in form.errors.items():
             flash(f"Error editing Venue. Field {error[0]} has error: {error[1][0]}")
         return render_template('pages/home.html')
@@ -570,7 +552,7 @@ def create_artist_submission():
         if error:
             abort(500)
         else:
-            print(response)
+            app.logger.debug(response)
             try:
                 # on successful db insert, flash success
                 flash('Artist ' + request.form['name'] + ' was successfully listed!')
@@ -585,25 +567,29 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 @app.route('/shows')
+@query_budget(2)
+@conditional('show', 'venue', 'artist', time_bucket=app.config['CONDITIONAL_GET_TIME_BUCKET'])
 def shows():
-    # displays list of shows at /shows
+    # displays list of shows at /shows, ?from=&to= take ISO dates and limit the range
     error = False
     data = []
+    next_cursor = None
+    current_datetime = datetime.now()
+    limit = min(request.args.get('limit', app.config['SHOWS_PER_PAGE'], type=int),
+                app.config['SHOWS_MAX_LIMIT'])
+    after = request.args.get('after')
+    show_range = {key: request.args[key] for key in ('from', 'to') if request.args.get(key)}
     try:
-        # Get the data about all Shows
-        shows_list = Show().query.all()
-        # Build the data object to return
-        for show in shows_list:
-            data.append(
-                {
-                    "venue_id": show.venue_id,
-                    "venue_name": show.venue.name,
-                    "artist_id": show.artist_id,
-                    "artist_name": show.artist.name,
-                    "artist_image_link": show.artist.image_link,
-                    "start_time": show.start_time
-                }
-            )
+        after = queries.decode_cursor(after) if after else None
+        start, end = queries.decode_range(show_range.get('from'), show_range.get('to'))
+    except ValueError:
+        abort(400)
+    if limit < 1:
+        abort(400)
+    try:
+        # Get one page of shows, starting after the cursor or at the start of the range
+        data, next_cursor = queries.show_page(current_datetime, after=after, limit=limit,
+                                              start=start, end=end)
     except:
         error = True
         error_line_number()
@@ -612,7 +598,8 @@ def shows():
     if error:
         abort(500)
     else:
-        return render_template('pages/shows.html', shows=data)
+        return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, limit=limit,
+                               show_range=show_range)
 
 
 @app.route('/shows/create')
@@ -629,14 +616,22 @@ def create_show_submission():
     response = {}
     form = ShowForm()
     if form.validate():
+        conflict = None
         try:
             show = Show()
             form.populate_obj(show)
-            db.session.add(show)
-            db.session.commit()
-            response['show_artist'] = form.artist_id.data
-            response['show_venue'] = form.venue_id.data
-            response['show_start_time'] = show.start_time
+            duration = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+            conflict = bookings.booking_conflict(db.session.connection(), show.artist_id, show.venue_id,
+                                                 show.start_time, duration)
+            if conflict is None:
+                db.session.add(show)
+                db.session.commit()
+                detail_cache.invalidate_show(show.venue_id, show.artist_id)
+                response['show_artist'] = form.artist_id.data
+                response['show_venue'] = form.venue_id.data
+                response['show_start_time'] = show.start_time
+            else:
+                db.session.rollback()
         except:
             error = True
             db.session.rollback()
@@ -644,6 +639,11 @@ def create_show_submission():
             flash('An error occurred. Show could not be listed.')
         if error:
             abort(500)
+        elif conflict is not None:
+            kind, show_id = conflict
+            flash(f'Show could not be listed: the {kind} already has show {show_id} '
+                  f'less than {app.config["SHOW_DURATION_MINUTES"]} minutes apart.')
+            return render_template('pages/home.html'), 409
         else:
             # on successful db insert, flash success
             flash('Show was successfully listed!')
@@ -654,6 +654,26 @@ def create_show_submission():
         return render_template('pages/home.html')
 
 
+#  Exports
+#  ----------------------------------------------------------------
+@app.route('/export/<any(venues, artists, shows):kind>.<any(csv, ndjson):format>')
+# The archive has no start time index, the shows export scans it
+@query_budget(1, seq_scans=['venue', 'artist', 'show_archive'])
+def export(kind, format):
+    # streams every matching row, ?from=&to= take ISO dates and filter the shows
+    try:
+        start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        query = exporter.export_query(kind, start=start, end=end,
+                                      state=request.args.get('state'), genre=request.args.get('genre'))
+    except ValueError:
+        abort(400)
+    # The request context, and its session, stay open until the last row is sent
+    rows = exporter.stream_export(db.session.connection(), query, format)
+    return Response(stream_with_context(rows), mimetype=exporter.mimetypes[format],
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{format}'})
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -664,6 +684,303 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+@app.cli.command('check-query-budgets')
+def check_query_budgets_command():
+    """Fail when a route issues more SQL statements than its query budget."""
+    # The harness posts the search forms without a CSRF token
+    app.config['WTF_CSRF_ENABLED'] = False
+    over_budget = False
+    for rule, method, status_code, view, statements in check_query_budgets(app):
+        exceeded = len(statements) > view.query_budget or status_code >= 500
+        over_budget = over_budget or exceeded
+        print(f"{'FAIL' if exceeded else 'ok':4} {method:4} {rule:40} {status_code} "
+              f"{len(statements)}/{view.query_budget} queries")
+        if exceeded:
+            for statement, parameters in statements:
+                print(f"       {' '.join(statement.split())}")
+    if over_budget:
+        sys.exit(1)
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail when a route reads a catalog table with a sequential scan.
+
+    Run it against a database seeded at benchmark scale, the planner rightly prefers
+    sequential scans on small tables.
+    """
+    app.config['WTF_CSRF_ENABLED'] = False
+    failed = False
+    for rule, method, statement, scans in check_query_plans(app):
+        failed = failed or bool(scans)
+        print(f"{'FAIL' if scans else 'ok':4} {method:4} {rule:40} {' '.join(statement.split())[:80]}")
+        for scan in scans:
+            print(f"       {scan}")
+    if failed:
+        sys.exit(1)
+
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Compile every template into TEMPLATE_CACHE_DIR, e.g. while deploying."""
+    if not app.config['TEMPLATE_CACHE_DIR']:
+        sys.exit('TEMPLATE_CACHE_DIR is not set.')
+    names = formatting.compile_templates(app.jinja_env)
+    print(f"Compiled {len(names)} templates into {app.config['TEMPLATE_CACHE_DIR']}")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Build the fingerprinted and pre-compressed CSS and JS bundles into static/dist."""
+    for name, filename in assets.build().items():
+        print(f'{name:10} {filename}')
+
+
+@app.cli.command('rollover-show-counters')
+@click.option('--interval', type=int, help='Keep rolling over every INTERVAL seconds.')
+def rollover_show_counters_command(interval):
+    """Move the shows that have started from the upcoming to the past counters.
+
+    Schedule it every minute, e.g. from cron, or run it with --interval.
+    """
+    while True:
+        with db.engine.begin() as connection:
+            moved = counters.rollover(connection)
+        print(f'{datetime.now().isoformat()} moved {moved} shows to past')
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+@app.cli.command('check-show-counters')
+@click.option('--repair', is_flag=True, help='Overwrite the drifted counters with a recount.')
+def check_show_counters_command(repair):
+    """Report the venues and artists whose show counters differ from a recount."""
+    with db.engine.begin() as connection:
+        drifted = counters.check(connection, repair=repair)
+    for table, owner_id, stored_upcoming, stored_past, upcoming, past in drifted:
+        print(f'{table} {owner_id}: upcoming {stored_upcoming} -> {upcoming}, past {stored_past} -> {past}')
+    print(f"{len(drifted)} drifted counters{' repaired' if repair else ''}")
+    if drifted and not repair:
+        sys.exit(1)
+
+
+@app.cli.command('maintain-show-partitions')
+@click.option('--ahead', default=3, show_default=True, help='Months partitioned ahead of the current one.')
+@click.option('--archive-after', default=12, show_default=True,
+              help='Age in months of the partitions moved to show_archive.')
+def maintain_show_partitions_command(ahead, archive_after):
+    """Create the show partitions of the coming months and archive the old ones.
+
+    Past months left in the default partition, e.g. by flask seed or flask import,
+    get their own partition too. Postgres only, schedule it daily, e.g. from cron.
+    """
+    try:
+        with db.engine.begin() as connection:
+            created, archived = partitions.maintain(connection, months_ahead=ahead,
+                                                    archive_after=archive_after)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    for name in created:
+        print(f'created {name}')
+    for name in archived:
+        print(f'archived {name}')
+    print(f'{len(created)} partitions created, {len(archived)} archived')
+
+
+@app.cli.command('seed')
+@click.option('--venues', default=10000, show_default=True)
+@click.option('--artists', default=100000, show_default=True)
+@click.option('--shows', default=1000000, show_default=True)
+@click.option('--seed', 'random_seed', default=0, show_default=True, help='Seed of the generated rows.')
+@click.option('--batch-size', default=10000, show_default=True)
+def seed_command(venues, artists, shows, random_seed, batch_size):
+    """Fill the database with generated venues, artists and shows."""
+    def progress(table, done, total):
+        print(f'{table}: {done}/{total}')
+
+    seed.seed_database(venues=venues, artists=artists, shows=shows, seed=random_seed,
+                       batch_size=batch_size, progress=progress)
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+              help='Format of PATH, told from its extension by default.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows inserted per transaction.')
+@click.option('--rejects', 'rejects_path', help='Where rejected rows are written, PATH.rejects by default.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an earlier run.')
+def import_command(kind, path, file_format, batch_size, rejects_path, restart):
+    """Validate and insert the venues, artists or shows of a CSV or NDJSON file.
+
+    Rows are checked like the create forms check them. Progress is checkpointed to
+    PATH.checkpoint, and running the same import again resumes after the last
+    committed batch.
+    """
+    file_format = file_format or importer.file_format(path)
+    rejects_path = rejects_path or path + '.rejects'
+    checkpoint_path = path + '.checkpoint'
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    resuming = os.path.exists(checkpoint_path)
+
+    def progress(checkpoint):
+        print(f"{kind}: {checkpoint['rows']} rows read, {checkpoint['inserted']} inserted, "
+              f"{checkpoint['rejected']} rejected")
+
+    with open(path, newline='', encoding='utf-8') as input_file, \
+            open(rejects_path, 'a' if resuming else 'w', encoding='utf-8') as rejects_file:
+        checkpoint = importer.import_file(db.engine, kind, input_file, file_format, rejects_file,
+                                          checkpoint_path,
+                                          timedelta(minutes=app.config['SHOW_DURATION_MINUTES']),
+                                          batch_size=batch_size, progress=progress)
+    progress(checkpoint)
+    if checkpoint['rejected']:
+        print(f'Rejected rows are in {rejects_path}')
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default='csv',
+              show_default=True)
+@click.option('--output', default='-', help='File written, standard output by default.')
+@click.option('--from', 'start', type=click.DateTime(), help='Only shows starting at or after this time.')
+@click.option('--to', 'end', type=click.DateTime(), help='Only shows starting before this time.')
+@click.option('--state', help='Only rows, or shows at venues, in this state.')
+@click.option('--genre', help='Only rows, or shows by artists, of this genre.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched at a time.')
+def export_command(kind, file_format, output, start, end, state, genre, batch_size):
+    """Stream the venues, artists or shows to a CSV or NDJSON file, in bounded memory."""
+    try:
+        query = exporter.export_query(kind, start=start, end=end,
+                                      state=state, genre=genre)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    with db.engine.connect() as connection, \
+            click.open_file(output, 'w', encoding='utf-8', lazy=False) as output_file:
+        for chunk in exporter.stream_export(connection, query, file_format, batch_size=batch_size):
+            output_file.write(chunk)
+
+
+@app.cli.command('delete')
+@click.argument('kind', type=click.Choice(['venues', 'artists']))
+@click.argument('ids', nargs=-1, type=int, required=True)
+def delete_command(kind, ids):
+    """Delete venues or artists, and their shows, by id in one statement."""
+    model = Venue if kind == 'venues' else Artist
+    deleted, show_count = deletes.delete_catalog_rows(db.session, model, ids)
+    print(f'Deleted {len(deleted)} {kind} and {show_count} shows, {len(set(ids)) - len(deleted)} ids not found')
+
+
+@app.cli.command('benchmark')
+@click.option('--requests', 'requests_per_route', default=100, show_default=True,
+              help='Requests sent to each route.')
+@click.option('--route', 'routes', multiple=True, help='Only benchmark this endpoint, can be repeated.')
+@click.option('--output', default='benchmark.json', show_default=True)
+@click.option('--compare', 'baseline_path', help='Report of an earlier revision to compare with.')
+@click.option('--label', help='Name of the revision being benchmarked.')
+def benchmark_command(requests_per_route, routes, output, baseline_path, label):
+    """Benchmark every route against the current database and write a JSON report."""
+    report = benchmark.run_benchmark(app, requests_per_route=requests_per_route,
+                                     routes=routes, label=label)
+    benchmark.write_report(report, output)
+    for route, result in report['routes'].items():
+        print(f"{route:26} {result['throughput']:8.1f} req/s  p50 {result['p50_ms']:7.2f}ms  "
+              f"p95 {result['p95_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms  "
+              f"{result['sql_statements_mean']:5.1f} queries")
+    if baseline_path:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        for route, metric, old, new, change in benchmark.compare_reports(baseline, report):
+            change = f'{change:+.1%}' if change is not None else 'n/a'
+            print(f'{route:26} {metric:20} {old:10.2f} -> {new:10.2f} {change}')
+
+
+@app.cli.command('benchmark-concurrency')
+@click.option('--requests', 'requests_per_route', default=200, show_default=True,
+              help='Requests sent to each variant of each route.')
+@click.option('--workers', default=8, show_default=True, help='Threads sending the requests.')
+@click.option('--latency', 'latency_ms', default=0.0, show_default=True,
+              help='Milliseconds added to every statement, SQLite only.')
+@click.option('--output', default='benchmark-concurrency.json', show_default=True)
+def benchmark_concurrency_command(requests_per_route, workers, latency_ms, output):
+    """Compare the detail and search views with their async twins under /async."""
+    report = benchmark.run_concurrency_benchmark(app, requests_per_route=requests_per_route,
+                                                 workers=workers, latency_ms=latency_ms)
+    benchmark.write_report(report, output)
+    for route, results in report['routes'].items():
+        for variant in ('sync', 'async'):
+            result = results[variant]
+            print(f"{route:16} {variant:5} {result['throughput']:8.1f} req/s  p50 {result['p50_ms']:7.2f}ms  "
+                  f"p95 {result['p95_ms']:7.2f}ms  {result['errors']} errors")
+        print(f"{route:16} async/sync throughput {results['speedup']:.2f}x")
+
+
+@app.cli.command('benchmark-shows')
+@click.option('--samples', default=200, show_default=True, help='Ranges and bookings timed.')
+@click.option('--output', default='benchmark-shows.json', show_default=True)
+def benchmark_shows_command(samples, output):
+    """Time the /shows date ranges and the double booking check, e.g. seeded with 1M shows."""
+    report = benchmark.run_show_benchmark(app, samples=samples)
+    benchmark.write_report(report, output)
+    print(f"{report['shows']} shows")
+    for name, result in report['ranges'].items():
+        print(f"range   {name:8} p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms  "
+              f"p99 {result['p99_ms']:7.2f}ms")
+    for name, result in report['bookings'].items():
+        print(f"booking {name:16} p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms  "
+              f"p99 {result['p99_ms']:7.2f}ms  {result['conflicts']} conflicts")
+
+
+@app.cli.command('benchmark-typeahead')
+@click.option('--names', default=100, show_default=True, help='Names typed per table.')
+@click.option('--output', default='benchmark-typeahead.json', show_default=True)
+def benchmark_typeahead_command(names, output):
+    """Time the typeahead keystroke by keystroke against the SQL search."""
+    report = benchmark.run_typeahead_benchmark(app, names=names)
+    benchmark.write_report(report, output)
+    for table, result in report['load'].items():
+        print(f"load       {table:7} {result['ms']:8.1f}ms for {result['rows']} names")
+    for variant in ('typeahead', 'sql_search'):
+        for table, result in report[variant].items():
+            print(f"{variant:10} {table:7} p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms  "
+                  f"p99 {result['p99_ms']:7.2f}ms  {result.get('sql_statements_mean', 1):4.1f} queries")
+
+
+@app.cli.command('benchmark-genres')
+@click.option('--samples', default=100, show_default=True, help='Genre filters timed per format.')
+@click.option('--output', default='benchmark-genres.json', show_default=True)
+def benchmark_genres_command(samples, output):
+    """Compare the size and filter speed of the genre names and genre bitmasks of the artists."""
+    report = benchmark.run_genre_benchmark(app, samples=samples)
+    benchmark.write_report(report, output)
+    print(f"{report['artists']} artists")
+    for variant, result in report['storage'].items():
+        print(f"storage {variant:6} {result['bytes']:12} bytes  {result['bytes_per_row']:6.1f} per row")
+    for kind in ('sql_filter', 'python_filter'):
+        for variant, result in report[kind].items():
+            print(f"{kind:13} {variant:6} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                  f"p99 {result['p99_ms']:8.2f}ms  {result['matches']} matches")
+
+
+@app.cli.command('benchmark-templates')
+@click.option('--tiles', default=30, show_default=True, help='Shows rendered on the page.')
+@click.option('--repeat', default=200, show_default=True, help='Renders timed per variant.')
+@click.option('--output', default='benchmark-templates.json', show_default=True)
+def benchmark_templates_command(tiles, repeat, output):
+    """Compare the render cost of a /shows tile before and after the datetime fast path."""
+    report = benchmark.run_template_benchmark(app, tiles=tiles, repeat=repeat)
+    benchmark.write_report(report, output)
+    for variant, result in report['render'].items():
+        print(f"render  {variant:13} {result['page_ms']:8.3f}ms per page  {result['per_tile_us']:8.1f}us per tile")
+    for variant, result in report['compile'].items():
+        print(f"compile {variant:13} {result['ms']:8.1f}ms for {result['templates']} templates")
+
+
 if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
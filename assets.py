@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import abort, request, send_from_directory
+
+try:
+    # Optional, browsers are sent the gzip files when it is missing
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bundles built from the files of the static folder, concatenated in this order
+bundles = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded by <head>, the other scripts at the end of <body>
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+        'js/script.js',
+    ],
+    'main.js': [
+        'js/libs/jquery-1.11.1.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# Pre-compressed variants in order of preference, by Content-Encoding
+encodings = (('br', '.br'), ('gzip', '.gz'))
+
+# Built files go to static/dist, at the depth of static/css so that the relative
+# url(../fonts/...) of the stylesheets still resolve
+output_folder = 'dist'
+manifest_name = 'manifest.json'
+
+_css_strings = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+
+
+# ----------------------------------------------------------------------------#
+# Build.
+# ----------------------------------------------------------------------------#
+def minify_css(source):
+    """Drop the comments and the whitespace of a stylesheet, leaving its strings untouched."""
+    parts = _css_strings.split(source)
+    for index in range(0, len(parts), 2):
+        part = re.sub(r'/\*.*?\*/', '', parts[index], flags=re.S)
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        parts[index] = part.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def build_bundle(static_folder, name):
+    sources = []
+    for path in bundles[name]:
+        with open(os.path.join(static_folder, path), encoding='utf-8') as source_file:
+            sources.append(source_file.read())
+    if name.endswith('.css'):
+        return minify_css('\n'.join(sources))
+    # The libraries are minified already, the separator ends any unterminated statement
+    return ';\n'.join(source.strip() for source in sources) + '\n'
+
+
+def _write(path, content):
+    # Replaced atomically, other workers may be reading or building the same file
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as output_file:
+        output_file.write(content)
+    os.replace(temporary_path, path)
+
+
+def build(static_folder):
+    """Build every bundle into static/dist and return the manifest written there.
+
+    Each bundle is named after the hash of its content, e.g. ``main.3f2a9c01b7d4.css``,
+    and written next to its ``.gz`` and, when brotli is installed, ``.br`` variants.
+    The manifest maps bundle names to their file. Files of earlier builds are kept
+    for the pages still referencing them.
+    """
+    directory = os.path.join(static_folder, output_folder)
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    for name in bundles:
+        content = build_bundle(static_folder, name).encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+        _write(os.path.join(directory, filename), content)
+        _write(os.path.join(directory, filename + '.gz'), gzip.compress(content, 9, mtime=0))
+        if brotli is not None:
+            _write(os.path.join(directory, filename + '.br'), brotli.compress(content, quality=11))
+        manifest[name] = filename
+    _write(os.path.join(directory, manifest_name), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+def _stale(static_folder):
+    manifest_path = os.path.join(static_folder, output_folder, manifest_name)
+    if not os.path.exists(manifest_path):
+        return True
+    built_at = os.path.getmtime(manifest_path)
+    return any(os.path.getmtime(os.path.join(static_folder, path)) > built_at
+               for sources in bundles.values() for path in sources)
+
+
+def load_manifest(static_folder):
+    with open(os.path.join(static_folder, output_folder, manifest_name)) as manifest_file:
+        return json.load(manifest_file)
+
+
+# ----------------------------------------------------------------------------#
+# Serving.
+# ----------------------------------------------------------------------------#
+class Assets:
+    """Serve the bundles under fingerprinted URLs, cached for ASSETS_MAX_AGE.
+
+    ``url_for('static', filename='main.css')`` returns the URL of the current build
+    of a bundle, and every other static file keeps its plain URL. Bundles are served
+    pre-compressed with brotli or gzip when the client accepts it, as immutable since
+    their URL changes with their content. They are rebuilt at startup when missing or
+    older than their sources, ``flask build-assets`` builds them while deploying.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = os.path.join(app.static_folder, output_folder)
+        if _stale(app.static_folder):
+            self.manifest = build(app.static_folder)
+        else:
+            self.manifest = load_manifest(app.static_folder)
+        app.add_url_rule(f'{app.static_url_path}/{output_folder}/<path:filename>', 'assets', self._serve)
+        app.url_defaults(self._fingerprint)
+
+    def build(self):
+        self.manifest = build(self.app.static_folder)
+        return self.manifest
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = f"{output_folder}/{self.manifest[values['filename']]}"
+
+    def _serve(self, filename):
+        # Fingerprinted bundles only, of the current build or an earlier one
+        if not re.fullmatch(r'[\w-]+\.[0-9a-f]{12}\.(css|js)', filename) \
+                or not os.path.isfile(os.path.join(self.directory, filename)):
+            abort(404)
+        max_age = self.app.config['ASSETS_MAX_AGE']
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in encodings:
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(self.directory, filename + suffix)):
+                response = send_from_directory(self.directory, filename + suffix, mimetype=mimetype,
+                                               download_name=filename, max_age=max_age)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.directory, filename, mimetype=mimetype, max_age=max_age)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
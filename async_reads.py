@@ -0,0 +1,179 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, g, render_template, request
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import search
+from conditional import conditional
+from models import show_history, Artist, Show, Venue
+from routing import read_only
+
+# Async drivers standing in for the sync ones of SQLALCHEMY_DATABASE_URI
+async_drivers = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# Columns of the detail payloads, as built by queries.venue_detail/artist_detail
+venue_fields = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+                'facebook_link', 'seeking_talent', 'seeking_description', 'image_link')
+artist_fields = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+                 'facebook_link', 'seeking_venue', 'seeking_description', 'image_link')
+
+async_reads = Blueprint('async_reads', __name__, url_prefix='/async')
+
+# Held while an engine makes its first connection, see async_engine()
+_engine_lock = threading.Lock()
+
+
+# ----------------------------------------------------------------------------#
+# Engines.
+# ----------------------------------------------------------------------------#
+def async_url(url):
+    """Return ``url`` with its driver swapped for asyncpg or aiosqlite."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in async_drivers:
+        raise RuntimeError(f'No async driver is known for {backend} databases.')
+    return url.set(drivername=async_drivers[backend])
+
+
+def _connect_args(url):
+    if url.get_backend_name() != 'postgresql':
+        return {}
+    config = current_app.config
+    return {
+        'timeout': config['DB_CONNECT_TIMEOUT'],
+        'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}
+    }
+
+
+async def async_engine(bind_key=None):
+    """Return the async engine of the primary, or of the replica ``bind_key``.
+
+    Flask runs every async view in an event loop of its own, and asyncpg
+    connections cannot move between loops, so the engines do not pool connections.
+    The first connection of an engine initializes its dialect behind a lock bound
+    to one loop, so it is made once, before the engine is shared.
+    """
+    engines = current_app.extensions.setdefault('async_reads', {})
+    if bind_key not in engines:
+        with _engine_lock:
+            if bind_key not in engines:
+                if bind_key is None:
+                    url = current_app.config['SQLALCHEMY_DATABASE_URI']
+                else:
+                    url = current_app.config['SQLALCHEMY_BINDS'][bind_key]
+                url = async_url(url)
+                engine = create_async_engine(url, poolclass=NullPool, connect_args=_connect_args(url))
+                async with engine.connect():
+                    pass
+                engines[bind_key] = engine
+    return engines[bind_key]
+
+
+async def _fetch_all(engine, query):
+    async with engine.connect() as connection:
+        return (await connection.execute(query)).all()
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+# Each detail page is read with three concurrent queries on their own connections:
+# the row, its past shows and its upcoming shows. Past shows are read from
+# show_history(), archived ones included, upcoming ones from the hot show table
+# only. They build the same dict as queries.split_shows() does from the cached
+# payload, so the templates are shared.
+
+async def _detail(engine, model, fields, row_id, shows, current_datetime):
+    history = show_history()
+    rows, past, upcoming = await asyncio.gather(
+        _fetch_all(engine, select(*(getattr(model, field) for field in fields)).where(model.id == row_id)),
+        _fetch_all(engine, shows(history).where(history.c.start_time <= current_datetime)),
+        _fetch_all(engine, shows(Show.__table__).where(Show.start_time > current_datetime)),
+    )
+    if not rows:
+        return None
+    data = dict(rows[0]._mapping)
+    data['past_shows'] = [dict(show._mapping) for show in past]
+    data['upcoming_shows'] = [dict(show._mapping) for show in upcoming]
+    data['past_shows_count'] = len(past)
+    data['upcoming_shows_count'] = len(upcoming)
+    return data
+
+
+async def venue_detail(engine, venue_id, current_datetime):
+    """Return the split detail of a venue, or None if it does not exist."""
+    def shows(source):
+        return select(source.c.artist_id, Artist.name.label('artist_name'),
+                      Artist.image_link.label('artist_image_link'), source.c.start_time) \
+            .join(Artist, Artist.id == source.c.artist_id) \
+            .where(source.c.venue_id == venue_id) \
+            .order_by(source.c.start_time, source.c.id)
+    return await _detail(engine, Venue, venue_fields, venue_id, shows, current_datetime)
+
+
+async def artist_detail(engine, artist_id, current_datetime):
+    """Return the split detail of an artist, or None if it does not exist."""
+    def shows(source):
+        return select(source.c.venue_id, Venue.name.label('venue_name'),
+                      Venue.image_link.label('venue_image_link'), source.c.start_time) \
+            .join(Venue, Venue.id == source.c.venue_id) \
+            .where(source.c.artist_id == artist_id) \
+            .order_by(source.c.start_time, source.c.id)
+    return await _detail(engine, Artist, artist_fields, artist_id, shows, current_datetime)
+
+
+async def search_async(engine, model, term, limit):
+    rows = await _fetch_all(engine, search.search_query(model, term, limit, engine.dialect.name))
+    return search.search_results(rows)
+
+
+# ----------------------------------------------------------------------------#
+# Views.
+# ----------------------------------------------------------------------------#
+# The async twins of show_venue, show_artist and the searches, mounted under
+# /async next to the sync views. They follow the replica ReplicaRouter picked.
+
+async def _engine():
+    return await async_engine(g.get('replica_bind'))
+
+
+@async_reads.route('/venues/<int:venue_id>')
+@conditional('venue', 'show', 'artist', time_bucket='CONDITIONAL_GET_TIME_BUCKET')
+async def show_venue(venue_id):
+    data = await venue_detail(await _engine(), venue_id, datetime.now())
+    if data is None:
+        abort(404)
+    return render_template('pages/show_venue.html', venue=data)
+
+
+@async_reads.route('/artists/<int:artist_id>')
+@conditional('artist', 'show', 'venue', time_bucket='CONDITIONAL_GET_TIME_BUCKET')
+async def show_artist(artist_id):
+    data = await artist_detail(await _engine(), artist_id, datetime.now())
+    if data is None:
+        abort(404)
+    return render_template('pages/show_artist.html', artist=data)
+
+
+@async_reads.route('/venues/search', methods=['POST'])
+@read_only
+async def search_venues():
+    term = request.form.get('search_term', '')
+    response = await search_async(await _engine(), Venue, term, current_app.config['SEARCH_RESULTS_LIMIT'])
+    return render_template('pages/search_venues.html', results=response, search_term=term)
+
+
+@async_reads.route('/artists/search', methods=['POST'])
+@read_only
+async def search_artists():
+    term = request.form.get('search_term', '')
+    response = await search_async(await _engine(), Artist, term, current_app.config['SEARCH_RESULTS_LIMIT'])
+    return render_template('pages/search_artists.html', results=response, search_term=term)
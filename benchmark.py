@@ -0,0 +1,623 @@
+import asyncio
+import json
+import math
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from sqlalchemy import event, func, select, text
+
+import bookings
+import formatting
+import genres
+import search
+
+from async_reads import async_engine
+from models import db, Artist, Show, Venue
+from query_budget import record_queries
+from routing import engines
+from typeahead import typeahead
+
+search_terms = ['the', 'hall', 'band', 'jazz', 'san', 'blue', 'sax', 'music', 'new york', 'x']
+
+
+# ----------------------------------------------------------------------------#
+# Scenarios.
+# ----------------------------------------------------------------------------#
+# Every scenario returns the (method, url, form data) of its next request. The ids
+# are drawn from the benchmarked database so detail pages spread over the catalog.
+
+def _scenarios(venue_ids, artist_ids, rng):
+    def venue_form():
+        return {
+            'name': f'Benchmark Venue {rng.randint(0, 10 ** 6)}',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1015 Folsom Street',
+            'phone': '123-123-1234',
+            'genres': ['Jazz', 'Folk'],
+            'facebook_link': 'https://www.facebook.com/benchmark',
+        }
+
+    def artist_form():
+        return {
+            'name': f'Benchmark Artist {rng.randint(0, 10 ** 6)}',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'phone': '326-123-5000',
+            'genres': ['Rock n Roll'],
+            'facebook_link': 'https://www.facebook.com/benchmark',
+        }
+
+    def show_form():
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 365))
+        return {
+            'artist_id': str(rng.choice(artist_ids)),
+            'venue_id': str(rng.choice(venue_ids)),
+            'start_time': start_time.strftime('%Y-%m-%d %H:00:00'),
+        }
+
+    return {
+        'index': lambda: ('GET', '/', None),
+        'venues': lambda: ('GET', f'/venues?page={rng.randint(1, 3)}', None),
+        'artists': lambda: ('GET', '/artists', None),
+        'shows': lambda: ('GET', '/shows', None),
+        'show_venue': lambda: ('GET', f'/venues/{rng.choice(venue_ids)}', None),
+        'show_artist': lambda: ('GET', f'/artists/{rng.choice(artist_ids)}', None),
+        'search_venues': lambda: ('POST', '/venues/search', {'search_term': rng.choice(search_terms)}),
+        'search_artists': lambda: ('POST', '/artists/search', {'search_term': rng.choice(search_terms)}),
+        'edit_venue': lambda: ('GET', f'/venues/{rng.choice(venue_ids)}/edit', None),
+        'edit_artist': lambda: ('GET', f'/artists/{rng.choice(artist_ids)}/edit', None),
+        'create_venue_submission': lambda: ('POST', '/venues/create', venue_form()),
+        'create_artist_submission': lambda: ('POST', '/artists/create', artist_form()),
+        'create_show_submission': lambda: ('POST', '/shows/create', show_form()),
+        'edit_venue_submission': lambda: ('POST', f'/venues/{rng.choice(venue_ids)}/edit', venue_form()),
+        'edit_artist_submission': lambda: ('POST', f'/artists/{rng.choice(artist_ids)}/edit', artist_form()),
+    }
+
+
+# ----------------------------------------------------------------------------#
+# Runner.
+# ----------------------------------------------------------------------------#
+def percentile(sorted_values, fraction):
+    # Nearest rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_benchmark(app, requests_per_route=100, routes=None, seed=0, label=None):
+    """Drive the routes of ``app`` through its test client and summarize each one.
+
+    Every route gets ``requests_per_route`` requests, the write routes included, so
+    run it against a disposable seeded database. Returns a JSON serializable report
+    holding the throughput, p50/p95/p99 latency in milliseconds, status codes and
+    SQL statements per request of every route.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        venue_ids = [row[0] for row in db.session.query(Venue.id).limit(100000)]
+        artist_ids = [row[0] for row in db.session.query(Artist.id).limit(100000)]
+        engine = db.engine
+        app_engines = engines()
+        db.session.close()
+    if not venue_ids or not artist_ids:
+        raise RuntimeError('The database needs venues and artists, run flask seed first.')
+
+    # The forms are posted without a CSRF token
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    scenarios = _scenarios(venue_ids, artist_ids, rng)
+    report = {
+        'label': label,
+        'created_at': datetime.utcnow().isoformat(),
+        'database': engine.dialect.name,
+        'requests_per_route': requests_per_route,
+        'routes': {}
+    }
+    for name, scenario in scenarios.items():
+        if routes and name not in routes:
+            continue
+        latencies = []
+        statement_counts = []
+        status_codes = {}
+        started = time.perf_counter()
+        for _ in range(requests_per_route):
+            method, url, data = scenario()
+            with record_queries(*app_engines) as statements:
+                start = time.perf_counter()
+                response = client.open(url, method=method, data=data)
+                latencies.append(time.perf_counter() - start)
+            statement_counts.append(len(statements))
+            status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        report['routes'][name] = {
+            'requests': requests_per_route,
+            'throughput': requests_per_route / elapsed if elapsed else None,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'sql_statements_mean': sum(statement_counts) / len(statement_counts),
+            'sql_statements_max': max(statement_counts),
+            'status_codes': {str(code): count for code, count in sorted(status_codes.items())}
+        }
+    return report
+
+
+def write_report(report, path):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+def compare_reports(baseline, current):
+    """Yield ``(route, metric, baseline, current, change)`` for every shared metric.
+
+    ``change`` is the relative difference, e.g. 0.25 for a value 25% higher than its
+    baseline, or None when the baseline is 0.
+    """
+    for route, metrics in current['routes'].items():
+        baseline_metrics = baseline['routes'].get(route)
+        if baseline_metrics is None:
+            continue
+        for metric in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'sql_statements_mean'):
+            old, new = baseline_metrics.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            yield route, metric, old, new, (new - old) / old if old else None
+
+
+# ----------------------------------------------------------------------------#
+# Sync and async views.
+# ----------------------------------------------------------------------------#
+# The routes served both by a sync view and by its async twin under /async, as
+# (method, path) templates filled with a random venue or artist id
+concurrency_routes = {
+    'show_venue': ('GET', '/venues/{venue_id}'),
+    'show_artist': ('GET', '/artists/{artist_id}'),
+    'search_venues': ('POST', '/venues/search'),
+    'search_artists': ('POST', '/artists/search'),
+}
+
+
+def _add_sqlite_latency(engine, seconds):
+    # Every statement waits in the thread executing it, like for a remote database:
+    # the request thread for the sync engines, the aiosqlite thread of the connection
+    # for the async ones
+    def delay(statement):
+        time.sleep(seconds)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        raw_connection = getattr(dbapi_connection, '_connection', None)
+        raw_connection = getattr(raw_connection, '_conn', dbapi_connection)
+        raw_connection.set_trace_callback(delay)
+
+    # Hooked on checkout, the first "connect" of the async engine already ran in
+    # another event loop and its lock would block
+    event.listen(engine, 'checkout', on_checkout)
+
+
+def run_concurrency_benchmark(app, requests_per_route=200, workers=8, latency_ms=0, seed=0):
+    """Compare the sync views with their async twins at a fixed number of workers.
+
+    ``workers`` threads share the requests of every route, as the threads of a
+    server process would. ``latency_ms`` delays every statement on SQLite to stand
+    in for the round trips to a remote database. Returns a JSON serializable report
+    holding the throughput and p50/p95 latency of both variants of every route.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        venue_ids = [row[0] for row in db.session.query(Venue.id).limit(100000)]
+        artist_ids = [row[0] for row in db.session.query(Artist.id).limit(100000)]
+        engines = [db.engine, asyncio.run(async_engine()).sync_engine]
+        db.session.close()
+    if not venue_ids or not artist_ids:
+        raise RuntimeError('The database needs venues and artists, run flask seed first.')
+    if latency_ms:
+        if engines[0].dialect.name != 'sqlite':
+            raise RuntimeError('Latency can only be simulated on SQLite databases.')
+        for engine in engines:
+            _add_sqlite_latency(engine, latency_ms / 1000)
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'database': engines[0].dialect.name,
+        'requests_per_route': requests_per_route,
+        'workers': workers,
+        'latency_ms': latency_ms,
+        'routes': {}
+    }
+
+    def timed_request(method, url, data):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        return time.perf_counter() - start, response.status_code
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, (method, path) in concurrency_routes.items():
+            requests = []
+            for _ in range(requests_per_route):
+                url = path.format(venue_id=rng.choice(venue_ids), artist_id=rng.choice(artist_ids))
+                data = {'search_term': rng.choice(search_terms)} if method == 'POST' else None
+                requests.append((method, url, data))
+            results = {}
+            for variant, prefix in (('sync', ''), ('async', '/async')):
+                started = time.perf_counter()
+                timings = list(executor.map(lambda request: timed_request(request[0], prefix + request[1],
+                                                                          request[2]), requests))
+                elapsed = time.perf_counter() - started
+                latencies = sorted(latency for latency, status_code in timings)
+                results[variant] = {
+                    'throughput': requests_per_route / elapsed if elapsed else None,
+                    'p50_ms': percentile(latencies, 0.50) * 1000,
+                    'p95_ms': percentile(latencies, 0.95) * 1000,
+                    'errors': sum(1 for latency, status_code in timings if status_code != 200)
+                }
+            results['speedup'] = results['async']['throughput'] / results['sync']['throughput']
+            report['routes'][name] = results
+    return report
+
+
+# ----------------------------------------------------------------------------#
+# Templates.
+# ----------------------------------------------------------------------------#
+def _baseline_format_datetime(value, format='medium'):
+    # The datetime filter before formatting.py: parsed pattern and no memo
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(value, formatting.datetime_formats.get(format, format), locale='en')
+
+
+def _baseline_format_show_times(shows, format='medium'):
+    return [(show, _baseline_format_datetime(show['start_time'], format)) for show in shows]
+
+
+def _template_environment(app, filters, bytecode_cache=None):
+    environment = app.create_jinja_environment()
+    environment.bytecode_cache = bytecode_cache
+    environment.filters['datetime'], environment.filters['show_times'] = filters
+    return environment
+
+
+def run_template_benchmark(app, tiles=30, repeat=200, seed=0):
+    """Measure the per-tile render cost of /shows and the compile time of the templates.
+
+    The page is rendered with ``tiles`` shows and with none, ``repeat`` times each,
+    with the filters before and after formatting.py. Start times are drawn from the
+    hours of a year, so pages repeat some of them as the seeded ones do. Returns a
+    JSON serializable report.
+    """
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, 20)
+    shows = [{
+        'venue_id': 1, 'venue_name': 'The Musical Hop', 'artist_id': 1, 'artist_name': 'Guns N Petals',
+        'artist_image_link': 'https://example.com/artist.jpg',
+        'start_time': start + timedelta(hours=rng.randrange(24 * 365))
+    } for _ in range(tiles)]
+    variants = {
+        'before': (_baseline_format_datetime, _baseline_format_show_times),
+        'after': (formatting.format_datetime, formatting.format_show_times),
+    }
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'tiles': tiles,
+        'repeat': repeat,
+        'render': {},
+        'compile': {}
+    }
+
+    with app.test_request_context('/shows'):
+        for variant, filters in variants.items():
+            formatting.format_datetime.cache_clear()
+            template = _template_environment(app, filters).get_template('pages/shows.html')
+            timings = {}
+            for name, page in (('page', shows), ('empty', [])):
+                context = {'shows': page, 'next_cursor': None, 'limit': tiles, 'show_range': {}}
+                app.update_template_context(context)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    template.render(context)
+                timings[name] = (time.perf_counter() - started) / repeat
+            report['render'][variant] = {
+                'page_ms': timings['page'] * 1000,
+                'per_tile_us': (timings['page'] - timings['empty']) / tiles * 10 ** 6 if tiles else None
+            }
+
+    # Compiling every template in a fresh environment, as a new worker does
+    with tempfile.TemporaryDirectory() as directory:
+        cache = formatting.bytecode_cache(directory)
+        for variant, bytecode_cache in (('cold', None), ('cold_to_cache', cache), ('warm', cache)):
+            environment = _template_environment(app, variants['after'], bytecode_cache)
+            started = time.perf_counter()
+            names = formatting.compile_templates(environment)
+            report['compile'][variant] = {
+                'templates': len(names),
+                'ms': (time.perf_counter() - started) * 1000
+            }
+    return report
+
+
+# ----------------------------------------------------------------------------#
+# Show ranges and double bookings.
+# ----------------------------------------------------------------------------#
+def _history_conflict(connection, artist_id, venue_id, start_time, duration):
+    # The check without the range probe: every show of the venue and of the artist
+    # is read and compared
+    for kind, column, owner_id in (('venue', Show.venue_id, venue_id), ('artist', Show.artist_id, artist_id)):
+        for show_id, show_start_time in connection.execute(select(Show.id, Show.start_time).where(column == owner_id)):
+            if abs(show_start_time - start_time) < duration:
+                return kind, show_id
+    return None
+
+
+def _latencies(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+
+def run_show_benchmark(app, samples=200, seed=0):
+    """Time the ``/shows`` date ranges and the double booking check on the current database.
+
+    Ranges are random weekends, Friday 18:00 to Monday, between the first and the
+    last show, requested from the HTML and the API lists. Bookings at random start
+    times, of random venues and artists and of the busiest ones, are checked with
+    bookings.booking_conflict(), its row locks included, and with a read of every
+    show of the venue and artist, in rolled back transactions. Returns a JSON
+    serializable report.
+    """
+    rng = random.Random(seed)
+    duration = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+    with app.app_context():
+        venue_ids = [row[0] for row in db.session.query(Venue.id).limit(100000)]
+        artist_ids = [row[0] for row in db.session.query(Artist.id).limit(100000)]
+        first, last, show_count = db.session.query(
+            func.min(Show.start_time), func.max(Show.start_time), func.count(Show.id)
+        ).one()
+        engine = db.engine
+        db.session.close()
+    if not show_count:
+        raise RuntimeError('The database needs shows, run flask seed first.')
+    if isinstance(first, str):
+        # SQLite aggregates return the stored text
+        first, last = datetime.fromisoformat(first), datetime.fromisoformat(last)
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'database': engine.dialect.name,
+        'shows': show_count,
+        'samples': samples,
+        'ranges': {},
+        'bookings': {}
+    }
+
+    client = app.test_client()
+    days = max((last - first).days, 1)
+    weekends = []
+    for _ in range(samples):
+        day = first.date() + timedelta(days=rng.randrange(days))
+        friday = datetime.combine(day - timedelta(days=(day.weekday() - 4) % 7), datetime.min.time())
+        weekends.append((friday + timedelta(hours=18), friday + timedelta(days=3)))
+    for name, path in (('html', '/shows'), ('api', '/api/v1/shows')):
+        latencies = []
+        rows = 0
+        for start, end in weekends:
+            url = f'{path}?from={start.isoformat()}&to={end.isoformat()}&limit=200'
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} answered {response.status_code}')
+            if name == 'api':
+                rows += len(response.get_json()['data'])
+        report['ranges'][name] = _latencies(latencies)
+        if name == 'api':
+            report['ranges'][name]['rows_mean'] = rows / samples
+
+    span = int((last - first).total_seconds())
+    with engine.connect() as connection:
+        # The venue and the artist with the most shows have the longest histories
+        busiest = [
+            connection.execute(
+                select(column).group_by(column).order_by(func.count().desc()).limit(1)
+            ).scalar()
+            for column in (Show.artist_id, Show.venue_id)
+        ]
+        for bookers in ('random', 'busiest'):
+            requests = [
+                (*(busiest if bookers == 'busiest' else (rng.choice(artist_ids), rng.choice(venue_ids))),
+                 first + timedelta(seconds=rng.randrange(span + 1)))
+                for _ in range(samples)
+            ]
+            for check_name, check in (('indexed', bookings.booking_conflict), ('history', _history_conflict)):
+                latencies = []
+                conflicts = 0
+                for artist_id, venue_id, start_time in requests:
+                    transaction = connection.begin()
+                    started = time.perf_counter()
+                    conflict = check(connection, artist_id, venue_id, start_time, duration)
+                    latencies.append(time.perf_counter() - started)
+                    transaction.rollback()
+                    conflicts += conflict is not None
+                report['bookings'][f'{bookers}_{check_name}'] = dict(_latencies(latencies), conflicts=conflicts)
+    return report
+
+
+# ----------------------------------------------------------------------------#
+# Typeahead.
+# ----------------------------------------------------------------------------#
+def run_typeahead_benchmark(app, names=100, seed=0):
+    """Time the typeahead keystroke by keystroke, against the SQL search it replaces.
+
+    The words of ``names`` random venue and artist names are typed a letter at a
+    time, every prefix requested from the typeahead endpoints and passed to the
+    search query of the database. The indexes are loaded before the timing, and the
+    load is reported separately. Returns a JSON serializable report.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        app_engines = engines()
+        dialect_name = db.engine.dialect.name
+        keystrokes = {}
+        for table, model in (('venue', Venue), ('artist', Artist)):
+            rows = db.session.query(model.name).limit(100000).all()
+            words = [rng.choice(name.split() or [name]) for name, in rng.sample(rows, min(names, len(rows)))]
+            keystrokes[table] = [word[:length] for word in words for length in range(1, len(word) + 1)]
+        db.session.close()
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'database': dialect_name,
+        'names': names,
+        'load': {},
+        'typeahead': {},
+        'sql_search': {}
+    }
+    client = app.test_client()
+    for table, model in (('venue', Venue), ('artist', Artist)):
+        typeahead.indexes.pop(table, None)
+        with app.app_context():
+            started = time.perf_counter()
+            index = typeahead.index(table)
+            report['load'][table] = {'ms': (time.perf_counter() - started) * 1000, 'rows': len(index)}
+
+        latencies = []
+        statement_counts = []
+        for prefix in keystrokes[table]:
+            with record_queries(*app_engines) as statements:
+                started = time.perf_counter()
+                response = client.get(f'/api/v1/{table}s/typeahead', query_string={'q': prefix})
+                latencies.append(time.perf_counter() - started)
+            statement_counts.append(len(statements))
+            if response.status_code != 200:
+                raise RuntimeError(f'The {table} typeahead answered {response.status_code}')
+        report['typeahead'][table] = dict(_latencies(latencies), keystrokes=len(latencies),
+                                          sql_statements_mean=sum(statement_counts) / len(statement_counts))
+
+        latencies = []
+        limit = app.config['TYPEAHEAD_RESULTS']
+        with app.app_context():
+            for prefix in keystrokes[table]:
+                started = time.perf_counter()
+                db.session.execute(search.search_query(model, prefix, limit, dialect_name)).all()
+                latencies.append(time.perf_counter() - started)
+            db.session.close()
+        report['sql_search'][table] = dict(_latencies(latencies), keystrokes=len(latencies))
+    return report
+
+
+# ----------------------------------------------------------------------------#
+# Genres.
+# ----------------------------------------------------------------------------#
+# The genre names the bitmasks replaced, rebuilt from the genre table into a
+# temporary table next to the masks: a GIN indexed array on Postgres, JSON on SQLite.
+_genre_formats = {
+    'postgresql': {
+        'create': 'CREATE TEMPORARY TABLE genre_formats (id integer PRIMARY KEY, '
+                  'names varchar(120)[] NOT NULL, mask integer NOT NULL)',
+        'names': 'ARRAY(SELECT name FROM genre WHERE artist.genres & genre.mask <> 0 ORDER BY genre.mask)',
+        'index': 'CREATE INDEX ON genre_formats USING gin (names)',
+        'sizes': 'SELECT sum(pg_column_size(names)), sum(pg_column_size(mask)) FROM genre_formats',
+        'names_filter': 'SELECT count(*) FROM genre_formats WHERE names && CAST(:names AS varchar(120)[])',
+    },
+    'sqlite': {
+        'create': 'CREATE TEMPORARY TABLE genre_formats (id integer PRIMARY KEY, '
+                  'names json NOT NULL, mask integer NOT NULL)',
+        'names': '(SELECT json_group_array(name) FROM (SELECT name FROM genre '
+                 'WHERE artist.genres & genre.mask ORDER BY genre.mask))',
+        'index': None,
+        # Integers take 1 to 4 bytes on SQLite, depending on their magnitude
+        'sizes': 'SELECT sum(length(names)), sum(CASE WHEN mask < 128 THEN 1 WHEN mask < 32768 THEN 2 '
+                 'WHEN mask < 8388608 THEN 3 ELSE 4 END) FROM genre_formats',
+        'names_filter': 'SELECT count(*) FROM genre_formats WHERE EXISTS (SELECT 1 FROM json_each(names) '
+                        'WHERE json_each.value IN (SELECT value FROM json_each(:names)))',
+    },
+}
+
+
+def run_genre_benchmark(app, samples=100, seed=0):
+    """Compare the genre names the artists used to store with their genre bitmasks.
+
+    Every artist's genres are written in both formats to a temporary table, whose
+    column sizes are summed. Filters on ``samples`` random sets of one to three
+    genres are timed as SQL counts, array overlap or JSON lookups against a bitwise
+    AND, and in Python over the rows read in each format. Returns a JSON
+    serializable report.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        engine = db.engine
+    statements = _genre_formats.get(engine.dialect.name)
+    if statements is None:
+        raise RuntimeError(f'No genre benchmark for {engine.dialect.name}.')
+    wanted = [rng.sample(genres.genre_names, rng.randint(1, 3)) for _ in range(samples)]
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(text(statements['create']))
+        connection.execute(text(
+            f"INSERT INTO genre_formats (id, names, mask) SELECT id, {statements['names']}, genres FROM artist"
+        ))
+        if statements['index']:
+            connection.execute(text(statements['index']))
+        rows = connection.execute(text('SELECT names, mask FROM genre_formats')).all()
+        if not rows:
+            raise RuntimeError('The database needs artists, run flask seed first.')
+        names_size, mask_size = connection.execute(text(statements['sizes'])).one()
+
+        report = {
+            'created_at': datetime.utcnow().isoformat(),
+            'database': engine.dialect.name,
+            'artists': len(rows),
+            'samples': samples,
+            'storage': {
+                'names': {'bytes': int(names_size), 'bytes_per_row': names_size / len(rows)},
+                'mask': {'bytes': int(mask_size), 'bytes_per_row': mask_size / len(rows)},
+            },
+            'sql_filter': {},
+            'python_filter': {}
+        }
+
+        names_filter = text(statements['names_filter'])
+        mask_filter = text('SELECT count(*) FROM genre_formats WHERE mask & :mask <> 0')
+        for variant in ('names', 'mask'):
+            latencies = []
+            matches = 0
+            for names in wanted:
+                started = time.perf_counter()
+                if variant == 'names':
+                    value = names if engine.dialect.name == 'postgresql' else json.dumps(names)
+                    matches += connection.execute(names_filter, {'names': value}).scalar()
+                else:
+                    matches += connection.execute(mask_filter, {'mask': genres.encode(names)}).scalar()
+                latencies.append(time.perf_counter() - started)
+            report['sql_filter'][variant] = dict(_latencies(latencies), matches=matches)
+        transaction.rollback()
+
+    name_lists = [json.loads(names) if isinstance(names, str) else names for names, mask in rows]
+    masks = [mask for names, mask in rows]
+    for variant in ('names', 'mask'):
+        latencies = []
+        matches = 0
+        for names in wanted:
+            started = time.perf_counter()
+            if variant == 'names':
+                names = set(names)
+                matches += sum(1 for row_names in name_lists if not names.isdisjoint(row_names))
+            else:
+                mask = genres.encode(names)
+                matches += sum(1 for row_mask in masks if row_mask & mask)
+            latencies.append(time.perf_counter() - started)
+        report['python_filter'][variant] = dict(_latencies(latencies), matches=matches)
+    return report
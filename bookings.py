@@ -0,0 +1,44 @@
+from sqlalchemy import select
+
+from models import show_archive, Artist, Show, Venue
+
+
+# ----------------------------------------------------------------------------#
+# Double bookings.
+# ----------------------------------------------------------------------------#
+# Shows have no end time, every show is taken to last SHOW_DURATION_MINUTES. Two
+# shows of one artist, or at one venue, starting less than that apart overlap. Each
+# check is a range probe of the (artist_id, start_time) or (venue_id, start_time)
+# index of show and of show_archive, since the form accepts past start times,
+# however many shows the artist or venue has had.
+
+def _overlapping_show(connection, owner, owner_id, start_time, duration):
+    for table in (Show.__table__, show_archive):
+        show_id = connection.execute(
+            select(table.c.id)
+            .where(table.c[owner] == owner_id,
+                   table.c.start_time > start_time - duration,
+                   table.c.start_time < start_time + duration)
+            .limit(1)
+        ).scalar()
+        if show_id is not None:
+            return show_id
+    return None
+
+
+def booking_conflict(connection, artist_id, venue_id, start_time, duration):
+    """Return ``(kind, show id)`` of a show overlapping a new one, or None.
+
+    ``kind`` is 'venue' or 'artist'. The venue and artist rows are locked until the
+    end of the transaction, so a concurrent booking of either waits for the show of
+    this one and sees it. The lock leaves the foreign key checks of other inserts
+    alone.
+    """
+    # Always locked in the same order, venue first
+    for model, owner_id in ((Venue, venue_id), (Artist, artist_id)):
+        connection.execute(select(model.id).where(model.id == owner_id).with_for_update(key_share=True))
+    for kind, owner_id in (('venue', venue_id), ('artist', artist_id)):
+        show_id = _overlapping_show(connection, f'{kind}_id', owner_id, start_time, duration)
+        if show_id is not None:
+            return kind, show_id
+    return None
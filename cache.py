@@ -0,0 +1,178 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from models import db, show_history
+
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+class LRUBackend:
+    """Bounded in-process cache evicting the least recently used entry first.
+
+    Entries expire ``ttl`` seconds after they were stored. Only suitable when a
+    single process serves the app, since other workers never see its invalidations.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Cache shared by every worker, stored in Redis with a per-key expiry.
+
+    Needs the ``redis`` package, which is only imported when this backend is used.
+    """
+
+    def __init__(self, url, ttl=300, prefix='fyyur:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class NullBackend:
+    """Stores nothing, so every lookup falls through to the database."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+# ----------------------------------------------------------------------------#
+# Detail cache.
+# ----------------------------------------------------------------------------#
+def venue_key(venue_id):
+    return f'venue:{venue_id}'
+
+
+def artist_key(artist_id):
+    return f'artist:{artist_id}'
+
+
+class DetailCache:
+    """Read-through cache of the venue and artist detail payloads.
+
+    The backend is picked from the app config: ``DETAIL_CACHE_URL`` selects a shared
+    Redis backend, otherwise an in-process LRU of ``DETAIL_CACHE_SIZE`` entries is
+    used, and a size of 0 disables caching. Entries live ``DETAIL_CACHE_TTL``
+    seconds at most.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ttl = app.config.get('DETAIL_CACHE_TTL', 300)
+        if app.config.get('DETAIL_CACHE_URL'):
+            self.backend = RedisBackend(app.config['DETAIL_CACHE_URL'], ttl=ttl)
+        elif app.config.get('DETAIL_CACHE_SIZE', 1024) > 0:
+            self.backend = LRUBackend(app.config.get('DETAIL_CACHE_SIZE', 1024), ttl=ttl)
+        else:
+            self.backend = NullBackend()
+
+    def get_or_load(self, key, loader):
+        """Return the cached value of ``key``, calling ``loader`` on a miss.
+
+        A loader returning None, e.g. for a missing row, is not cached.
+        """
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.backend.set(key, value)
+        return value
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    # Invalidation. A venue page lists the artists playing there and an artist page
+    # lists the venues it plays at, so a change to either drops both sides.
+
+    def invalidate_show(self, venue_id, artist_id):
+        self.delete(venue_key(venue_id), artist_key(artist_id))
+
+    def invalidate_venue(self, venue_id, artist_ids=None):
+        """Drop a venue and the artists with shows there.
+
+        Pass ``artist_ids`` when the shows are about to be deleted, otherwise they are
+        looked up.
+        """
+        if artist_ids is None:
+            # Archived shows are listed on the pages too
+            history = show_history()
+            artist_ids = [row[0] for row in db.session.query(history.c.artist_id)
+                          .filter(history.c.venue_id == venue_id).distinct()]
+        self.delete(venue_key(venue_id), *[artist_key(artist_id) for artist_id in artist_ids])
+
+    def invalidate_artist(self, artist_id, venue_ids=None):
+        """Drop an artist and the venues it has shows at."""
+        if venue_ids is None:
+            history = show_history()
+            venue_ids = [row[0] for row in db.session.query(history.c.venue_id)
+                         .filter(history.c.artist_id == artist_id).distinct()]
+        self.delete(artist_key(artist_id), *[venue_key(venue_id) for venue_id in venue_ids])
+
+
+detail_cache = DetailCache()
@@ -0,0 +1,176 @@
+import threading
+import time
+import zlib
+
+from flask import request
+
+from metrics import registry
+
+try:
+    # Optional, gzip is negotiated when it is missing
+    import brotli
+except ImportError:
+    brotli = None
+
+# Types worth compressing, images, fonts and archives are compressed already
+compressible_mimetypes = frozenset([
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'application/xml', 'image/svg+xml',
+])
+
+registry.describe('fyyur_compression_input_bytes_total', 'counter',
+                  'Response bytes before compression by encoding.')
+registry.describe('fyyur_compression_output_bytes_total', 'counter',
+                  'Response bytes after compression by encoding.')
+registry.describe('fyyur_compression_cpu_seconds_total', 'counter',
+                  'CPU time spent compressing responses by encoding.')
+registry.describe('fyyur_compression_ratio', 'gauge',
+                  'Input bytes per output byte of every compressed response so far, by encoding.')
+
+# Bytes in and out by encoding, read by the ratio gauge
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+def _collect_ratio():
+    with _totals_lock:
+        totals = dict(_totals)
+    return [
+        ('fyyur_compression_ratio', {'encoding': encoding}, input_bytes / output_bytes)
+        for encoding, (input_bytes, output_bytes) in totals.items()
+        if output_bytes
+    ]
+
+
+registry.add_collector(_collect_ratio)
+
+
+# ----------------------------------------------------------------------------#
+# Compressors.
+# ----------------------------------------------------------------------------#
+class Compressor:
+    """Compress a body chunk by chunk, counting its bytes and the CPU time spent.
+
+    Chunks are flushed by default so that the client receives each one as soon as
+    it is written, which costs a little ratio on small chunks.
+    """
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            # wbits 31 writes the gzip header and trailer around the deflate stream
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.cpu_seconds = 0.0
+
+    def _timed(self, compress, *args):
+        # Thread CPU time, other requests run in the other threads of the process
+        start = time.thread_time()
+        data = compress(*args)
+        self.cpu_seconds += time.thread_time() - start
+        self.output_bytes += len(data)
+        return data
+
+    def compress(self, chunk, flush=True):
+        self.input_bytes += len(chunk)
+        if self.encoding == 'br':
+            data = self._timed(self._compressor.process, chunk)
+            return data + self._timed(self._compressor.flush) if flush else data
+        data = self._timed(self._compressor.compress, chunk)
+        return data + self._timed(self._compressor.flush, zlib.Z_SYNC_FLUSH) if flush else data
+
+    def finish(self):
+        if self.encoding == 'br':
+            data = self._timed(self._compressor.finish)
+        else:
+            data = self._timed(self._compressor.flush)
+        labels = {'encoding': self.encoding}
+        registry.inc('fyyur_compression_input_bytes_total', labels, self.input_bytes)
+        registry.inc('fyyur_compression_output_bytes_total', labels, self.output_bytes)
+        registry.inc('fyyur_compression_cpu_seconds_total', labels, self.cpu_seconds)
+        with _totals_lock:
+            input_bytes, output_bytes = _totals.get(self.encoding, (0, 0))
+            _totals[self.encoding] = (input_bytes + self.input_bytes, output_bytes + self.output_bytes)
+        return data
+
+
+def _compress_chunks(compressor, chunks):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # Closes the wrapped body, e.g. the database result of a streamed export
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+# ----------------------------------------------------------------------------#
+# Middleware.
+# ----------------------------------------------------------------------------#
+class Compression:
+    """Compress responses with brotli or gzip, as negotiated from Accept-Encoding.
+
+    Buffered responses are compressed whole when they hold ``COMPRESSION_MIN_SIZE``
+    bytes or more. Streamed responses, whose size is unknown, are always compressed,
+    chunk by chunk as they are sent. Responses carrying a Content-Encoding already,
+    like the pre-compressed bundles, or a type outside ``compressible_mimetypes`` are
+    left alone.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('COMPRESSION_ENABLED'):
+            return
+        self.app = app
+        app.after_request(self._compress)
+
+    def _encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _compress(self, response):
+        if response.mimetype not in compressible_mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+        if request.method == 'HEAD' or response.status_code != 200 or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers or response.cache_control.no_transform:
+            return response
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < self.app.config['COMPRESSION_MIN_SIZE']:
+            return response
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+
+        config = self.app.config
+        level = config['COMPRESSION_BROTLI_QUALITY'] if encoding == 'br' else config['COMPRESSION_GZIP_LEVEL']
+        compressor = Compressor(encoding, level)
+        if response.is_streamed:
+            response.response = _compress_chunks(compressor, response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compressor.compress(response.get_data(), flush=False) + compressor.finish())
+        response.content_encoding = encoding
+        # Strong validators identify a representation, the compressed one differs
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+
+compression = Compression()
@@ -0,0 +1,117 @@
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, TableVersion
+
+tracked_tables = ('venue', 'artist', 'show')
+
+
+# ----------------------------------------------------------------------------#
+# Table versions.
+# ----------------------------------------------------------------------------#
+def bump(connection, *tables):
+    """Increment the version of ``tables`` on ``connection``.
+
+    Flushes through the ORM bump their tables automatically. Statements that bypass
+    the ORM, such as bulk inserts or deletes, must call this in their transaction.
+    """
+    tables = [table for table in tables if table in tracked_tables]
+    if tables:
+        connection.execute(
+            TableVersion.__table__.update()
+            .where(TableVersion.name.in_(tables))
+            .values(version=TableVersion.version + 1, updated_at=datetime.utcnow())
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed_tables(flush_session, flush_context):
+    tables = set()
+    for instance in flush_session.new:
+        tables.add(instance.__table__.name)
+    for instance in flush_session.deleted:
+        tables.add(instance.__table__.name)
+    for instance in flush_session.dirty:
+        if flush_session.is_modified(instance, include_collections=False):
+            tables.add(instance.__table__.name)
+    bump(flush_session.connection(), *tables)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _insert_versions(target, connection, **kw):
+    # Tables built with db.create_all() start with a version row per tracked table,
+    # the migration inserts them otherwise
+    connection.execute(target.insert(), [
+        {'name': table, 'version': 0, 'updated_at': datetime.utcnow()}
+        for table in tracked_tables
+    ])
+
+
+def table_versions(*tables):
+    """Return ``(versions, updated_at)`` of ``tables`` in one primary key lookup."""
+    rows = db.session.query(TableVersion.name, TableVersion.version, TableVersion.updated_at) \
+        .filter(TableVersion.name.in_(tables)) \
+        .all()
+    versions = {name: version for name, version, updated_at in rows}
+    updated_at = max((row.updated_at for row in rows), default=None)
+    return [versions.get(table, 0) for table in tables], updated_at
+
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+def conditional(*tables, time_bucket=None):
+    """Answer ``If-None-Match``/``If-Modified-Since`` for a page built from ``tables``.
+
+    Place it below ``@app.route``. The validators are computed from the table versions
+    before the view runs, and a matching request gets a 304 without the view
+    querying or rendering anything. Pages that split shows into past and upcoming
+    change as time passes and pass ``time_bucket``, the number of seconds during
+    which they are considered unchanged; it is also the validity of their validators.
+    Blueprints, which have no app config at import time, pass the name of the config
+    key holding it instead.
+    """
+    def decorator(view):
+        # Async views are run to completion like Flask runs them
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            view_function = current_app.ensure_sync(view)
+            # A pending flash message is rendered into the next page, which must not
+            # be answered from the client cache
+            if request.method != 'GET' or session.get('_flashes'):
+                return view_function(*args, **kwargs)
+
+            versions, updated_at = table_versions(*tables)
+            etag = '-'.join(str(version) for version in versions)
+            seconds = current_app.config[time_bucket] if isinstance(time_bucket, str) else time_bucket
+            if seconds:
+                bucket = int(time.time()) // seconds
+                etag += f'-{bucket}'
+                bucket_start = datetime.utcfromtimestamp(bucket * seconds)
+                updated_at = max(updated_at, bucket_start) if updated_at else bucket_start
+            if updated_at is not None:
+                updated_at = updated_at.replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (updated_at is not None and request.if_modified_since is not None
+                                and updated_at <= request.if_modified_since.replace(tzinfo=None))
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view_function(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if updated_at is not None:
+                response.last_modified = updated_at
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
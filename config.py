@@ -10,6 +10,99 @@ DEBUG = True
 
 # Connect to the database
 
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-SQLALCHEMY_ECHO = True
\ No newline at end of file
+
+# Connection pool. A request waiting longer than DB_POOL_TIMEOUT seconds for a
+# connection gets a 503 instead of holding its worker, and statements running
+# longer than DB_STATEMENT_TIMEOUT milliseconds are cancelled by Postgres.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 2))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 3))
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 5000))
+
+
+def engine_options(uri):
+    # SQLite databases, used for local testing, do not use a sized pool
+    if not uri.startswith('postgresql'):
+        return {'pool_pre_ping': DB_POOL_PRE_PING}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'connect_args': {
+            'connect_timeout': DB_CONNECT_TIMEOUT,
+            'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+        }
+    }
+
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# Read replicas, as a comma separated DATABASE_REPLICA_URLS. Read requests go to
+# one of them, except for clients which wrote less than REPLICA_PIN_SECONDS ago.
+SQLALCHEMY_BINDS = {
+    f'replica{index}': url
+    for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))
+}
+REPLICA_PIN_SECONDS = 5
+# Log every SQL statement, only useful while debugging a query
+SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO') == '1'
+
+# Number of (city, state) areas listed per page on /venues
+AREAS_PER_PAGE = 50
+
+# Maximum number of ranked results shown by the venue and artist searches
+SEARCH_RESULTS_LIMIT = 50
+
+# Default and maximum number of shows per page on /shows
+SHOWS_PER_PAGE = 30
+SHOWS_MAX_LIMIT = 200
+
+# Shows have no end time. Shows of one artist, or at one venue, starting less than
+# this many minutes apart are refused as double bookings, see bookings.py
+SHOW_DURATION_MINUTES = 180
+
+# Names suggested by the venue and artist typeaheads, served from in-process
+# indexes which pick up the changes of other workers within
+# TYPEAHEAD_REFRESH_SECONDS, see typeahead.py
+TYPEAHEAD_RESULTS = 10
+TYPEAHEAD_REFRESH_SECONDS = 30
+
+# Default and maximum number of rows per page of the /api/v1 lists
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Venue and artist detail page cache. Entries live DETAIL_CACHE_TTL seconds in an
+# in-process LRU of DETAIL_CACHE_SIZE entries (0 disables it), or in Redis when
+# DETAIL_CACHE_URL is set so that every worker shares them.
+DETAIL_CACHE_SIZE = 1024
+DETAIL_CACHE_TTL = 300
+DETAIL_CACHE_URL = os.environ.get('DETAIL_CACHE_URL')
+
+# Compiled templates are kept in TEMPLATE_CACHE_DIR so that new workers skip the
+# compilation, see `flask compile-templates`. Empty disables the cache.
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(basedir, '.template-cache'))
+
+# Lifetime of the fingerprinted CSS and JS bundles in browser caches, see assets.py
+ASSETS_MAX_AGE = 365 * 24 * 60 * 60
+
+# Text responses of COMPRESSION_MIN_SIZE bytes or more, and every streamed one,
+# are sent brotli or gzip encoded to the clients accepting it. Higher levels trade
+# CPU for bandwidth, see the fyyur_compression_* metrics when tuning them.
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') == '1'
+COMPRESSION_MIN_SIZE = 500
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+# Pages splitting shows into past and upcoming keep their ETag/Last-Modified
+# validators for this many seconds at most, see conditional.py
+CONDITIONAL_GET_TIME_BUCKET = 60
+
+# Record request, SQL, template and pool metrics and serve them on /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED') == '1'
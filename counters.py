@@ -0,0 +1,187 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from conditional import bump
+from models import show_history, Artist, Show, ShowCounterState, Venue
+
+# Each show counts towards its venue and its artist
+owners = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+# Venue.upcoming_shows_count/past_shows_count and their Artist twins count the
+# shows starting after and before ShowCounterState.rolled_at. They are adjusted in
+# the transaction creating, moving or deleting a show, and rollover() advances
+# rolled_at, moving the shows started in between from upcoming to past.
+
+def rolled_at(connection, lock=None):
+    """Return the time the counters were last rolled over.
+
+    ``lock`` is 'share' for writers adjusting the counters, which must not interleave
+    with a rollover, and 'update' for the rollover and repairs themselves.
+    """
+    query = select(ShowCounterState.rolled_at).where(ShowCounterState.id == 1)
+    if lock is not None:
+        query = query.with_for_update(read=lock == 'share')
+    return connection.execute(query).scalar()
+
+
+def _update_counters(connection, model, deltas):
+    # deltas maps an owner id to its (upcoming, past) increments
+    rows = [
+        {'owner_id': owner_id, 'upcoming': upcoming, 'past': past}
+        for owner_id, (upcoming, past) in deltas.items()
+        if upcoming or past
+    ]
+    if rows:
+        table = model.__table__
+        connection.execute(
+            update(table)
+            .where(table.c.id == bindparam('owner_id'))
+            .values(
+                upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+                past_shows_count=table.c.past_shows_count + bindparam('past')
+            ),
+            rows
+        )
+        # Pages listing the counters are validated by the owner table version
+        bump(connection, table.name)
+
+
+def apply_show_changes(connection, added=(), removed=()):
+    """Adjust the counters for shows added and removed in the current transaction.
+
+    ``added`` and ``removed`` hold ``(venue_id, artist_id, start_time)`` tuples.
+    ORM flushes call this automatically, statements that insert or delete shows
+    without the ORM must call it themselves.
+    """
+    if not added and not removed:
+        return
+    boundary = rolled_at(connection, lock='share')
+    for model, column in owners:
+        deltas = defaultdict(lambda: [0, 0])
+        for sign, shows in ((1, added), (-1, removed)):
+            for venue_id, artist_id, start_time in shows:
+                owner_id = int(venue_id if column == 'venue_id' else artist_id)
+                deltas[owner_id][0 if start_time > boundary else 1] += sign
+        _update_counters(connection, model, deltas)
+
+
+def apply_owner_deletes(connection, model, ids):
+    """Adjust the counters for the shows cascaded from deleting the ``model`` rows ``ids``.
+
+    The database deletes the shows of a deleted venue along with it, which takes them
+    off the counters of their artists, and the other way round. Call it before the
+    DELETE, in its transaction. Returns the ``{owner id: show count}`` of the other
+    side.
+    """
+    boundary = rolled_at(connection, lock='share')
+    # Archived shows are counted too and cascade along
+    history = show_history()
+    column = history.c[dict(owners)[model]]
+    other_model, other_column = next((owner, name) for owner, name in owners if owner is not model)
+    other_column = history.c[other_column]
+    rows = connection.execute(
+        select(
+            other_column,
+            func.sum(case((history.c.start_time > boundary, 1), else_=0)),
+            func.sum(case((history.c.start_time <= boundary, 1), else_=0))
+        ).where(column.in_(ids)).group_by(other_column)
+    ).all()
+    _update_counters(connection, other_model, {owner_id: (-upcoming, -past) for owner_id, upcoming, past in rows})
+    return {owner_id: upcoming + past for owner_id, upcoming, past in rows}
+
+
+def _show_values(show, previous=False):
+    values = []
+    for attribute in ('venue_id', 'artist_id', 'start_time'):
+        history = inspect(show).attrs[attribute].history
+        if previous and history.deleted:
+            values.append(history.deleted[0])
+        else:
+            values.append(getattr(show, attribute))
+    return tuple(values)
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed_shows(flush_session, flush_context):
+    added = [_show_values(show) for show in flush_session.new if isinstance(show, Show)]
+    removed = [_show_values(show) for show in flush_session.deleted if isinstance(show, Show)]
+    for show in flush_session.dirty:
+        if isinstance(show, Show) and flush_session.is_modified(show):
+            removed.append(_show_values(show, previous=True))
+            added.append(_show_values(show))
+    apply_show_changes(flush_session.connection(), added, removed)
+
+
+@event.listens_for(ShowCounterState.__table__, 'after_create')
+def _insert_state(target, connection, **kw):
+    connection.execute(target.insert(), {'id': 1, 'rolled_at': datetime.now()})
+
+
+# ----------------------------------------------------------------------------#
+# Maintenance.
+# ----------------------------------------------------------------------------#
+def rollover(connection, now=None):
+    """Move the shows started since the last rollover from upcoming to past.
+
+    Only reads the shows starting between the previous rollover and ``now``, through
+    the start time index. Returns the number of shows moved.
+    """
+    now = now or datetime.now()
+    previous = rolled_at(connection, lock='update')
+    if now <= previous:
+        return 0
+    moved = 0
+    for model, column in owners:
+        owner_column = getattr(Show, column)
+        rows = connection.execute(
+            select(owner_column, func.count())
+            .where(Show.start_time > previous, Show.start_time <= now)
+            .group_by(owner_column)
+        ).all()
+        _update_counters(connection, model, {owner_id: (-count, count) for owner_id, count in rows})
+        if model is Venue:
+            moved = sum(count for owner_id, count in rows)
+    connection.execute(
+        update(ShowCounterState.__table__).where(ShowCounterState.id == 1).values(rolled_at=now)
+    )
+    return moved
+
+
+def check(connection, repair=False):
+    """Compare every stored counter with a recount of the show table.
+
+    Returns ``(table, id, stored_upcoming, stored_past, upcoming, past)`` for every
+    drifted row, and overwrites the drifted counters when ``repair`` is set. The
+    state row stays locked meanwhile, so no show is counted while recounting.
+    """
+    boundary = rolled_at(connection, lock='update')
+    drifted = []
+    history = show_history()
+    for model, column in owners:
+        owner_column = history.c[column]
+        actual = select(
+            owner_column.label('owner_id'),
+            func.sum(case((history.c.start_time > boundary, 1), else_=0)).label('upcoming'),
+            func.sum(case((history.c.start_time <= boundary, 1), else_=0)).label('past')
+        ).group_by(owner_column).subquery()
+        upcoming = func.coalesce(actual.c.upcoming, 0)
+        past = func.coalesce(actual.c.past, 0)
+        rows = connection.execute(
+            select(model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past)
+            .outerjoin(actual, actual.c.owner_id == model.id)
+            .where(or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past))
+        ).all()
+        drifted.extend((model.__tablename__,) + tuple(row) for row in rows)
+        if repair:
+            _update_counters(connection, model, {
+                owner_id: (upcoming - stored_upcoming, past - stored_past)
+                for owner_id, stored_upcoming, stored_past, upcoming, past in rows
+            })
+    return drifted
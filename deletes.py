@@ -0,0 +1,56 @@
+from sqlalchemy import delete, select
+
+import counters
+from cache import detail_cache, artist_key, venue_key
+from conditional import bump
+from models import Venue
+from typeahead import typeahead
+
+
+# ----------------------------------------------------------------------------#
+# Deletes.
+# ----------------------------------------------------------------------------#
+# Venues and artists are deleted with one DELETE statement, their shows by the ON
+# DELETE CASCADE of the show foreign keys. Nothing is loaded into the session, so
+# the flush hooks keeping the counters and table versions never see the shows and
+# delete_rows() does their work itself.
+
+def delete_rows(connection, model, ids):
+    """Delete the ``model`` rows ``ids`` and their shows in the current transaction.
+
+    Missing ids are skipped. Returns ``(deleted ids, show count, other side ids)``,
+    the other side being the artists with shows at the deleted venues or the venues
+    of the deleted artists, whose pages list the deleted shows.
+    """
+    # Locked first, so no show is added to them between the recount and the delete
+    ids = connection.execute(
+        select(model.id).where(model.id.in_(set(ids))).with_for_update()
+    ).scalars().all()
+    if not ids:
+        return [], 0, []
+    shows_by_owner = counters.apply_owner_deletes(connection, model, ids)
+    connection.execute(delete(model.__table__).where(model.id.in_(ids)))
+    bump(connection, model.__tablename__, *(['show'] if shows_by_owner else []))
+    return ids, sum(shows_by_owner.values()), list(shows_by_owner)
+
+
+def invalidate_deleted(model, ids, other_ids):
+    """Drop the cached pages and typeahead names of deleted rows, and the pages of the other side, once committed."""
+    if model is Venue:
+        keys = [venue_key(venue_id) for venue_id in ids] + [artist_key(artist_id) for artist_id in other_ids]
+    else:
+        keys = [artist_key(artist_id) for artist_id in ids] + [venue_key(venue_id) for venue_id in other_ids]
+    detail_cache.delete(*keys)
+    for row_id in ids:
+        typeahead.apply(model.__tablename__, row_id, None)
+
+
+def delete_catalog_rows(session, model, ids):
+    """Delete the ``model`` rows ``ids``, commit and invalidate the cached pages.
+
+    Returns ``(deleted ids, show count)``.
+    """
+    deleted, show_count, other_ids = delete_rows(session.connection(), model, ids)
+    session.commit()
+    invalidate_deleted(model, deleted, other_ids)
+    return deleted, show_count
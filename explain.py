@@ -0,0 +1,74 @@
+import json
+import re
+
+from models import db
+from query_budget import check_query_budgets
+
+# Tables that grow with the catalog, a sequential scan of which is a missing index
+hot_tables = frozenset(['venue', 'artist', 'show', 'show_archive'])
+
+# Partitions of the show tables, e.g. show_2026_10, are reported as their table
+partition_suffix = re.compile(r'_(\d{4}_\d{2}|default)$')
+
+
+# ----------------------------------------------------------------------------#
+# Query plans.
+# ----------------------------------------------------------------------------#
+def _postgresql_seq_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(partition_suffix.sub('', node['Relation Name']))
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def _sqlite_seq_scans(connection, statement, parameters):
+    # Full table scans read "SCAN <table>", index scans "SCAN <table> USING ... INDEX"
+    # and lookups "SEARCH <table> USING ..."
+    scans = []
+    for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters):
+        words = row[-1].split()
+        if len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words:
+            scans.append(words[1])
+    return scans
+
+
+plan_readers = {
+    'postgresql': _postgresql_seq_scans,
+    'sqlite': _sqlite_seq_scans
+}
+
+
+def seq_scans(connection, statement, parameters):
+    """Return the tables ``statement`` reads with a sequential scan."""
+    reader = plan_readers.get(connection.dialect.name)
+    if reader is None:
+        raise RuntimeError(f'Query plans of {connection.dialect.name} databases are not supported.')
+    return reader(connection, statement, parameters)
+
+
+def check_query_plans(app):
+    """Explain every SELECT issued by the budgeted routes of ``app``.
+
+    Yields ``(rule, method, statement, scans)`` per statement, where ``scans`` lists
+    the catalog tables read with a sequential scan the view did not declare through
+    ``@query_budget(..., seq_scans=...)``.
+    """
+    results = check_query_budgets(app)
+    with app.app_context():
+        with db.engine.connect() as connection:
+            for rule, method, status_code, view, statements in results:
+                for statement, parameters in statements:
+                    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                        continue
+                    scans = [
+                        table for table in seq_scans(connection, statement, parameters)
+                        if table in hot_tables and table not in view.allowed_seq_scans
+                    ]
+                    yield rule, method, statement, scans
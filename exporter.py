@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from models import show_history, Artist, Venue
+
+mimetypes = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+# Columns of the exports, named like the columns `flask import` reads
+export_columns = {
+    'venues': [Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+               Venue.image_link, Venue.genres, Venue.facebook_link, Venue.website,
+               Venue.seeking_talent, Venue.seeking_description],
+    'artists': [Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.image_link,
+                Artist.genres, Artist.facebook_link, Artist.website, Artist.seeking_venue,
+                Artist.seeking_description],
+}
+
+
+def show_export_columns(shows):
+    # The shows are read from show_history(), so archived ones are exported too
+    return [shows.c.id, shows.c.venue_id, Venue.name.label('venue_name'), Venue.state.label('venue_state'),
+            shows.c.artist_id, Artist.name.label('artist_name'), shows.c.start_time]
+
+
+# Start times are written in the format of the show form
+datetime_format = '%Y-%m-%d %H:%M:%S'
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+def export_query(kind, start=None, end=None, state=None, genre=None):
+    """Build the SELECT of a ``kind`` export, filtered on the arguments given.
+
+    Shows are filtered on their start time, ``start`` included and ``end`` excluded,
+    the state of their venue and the genres of their artist, in start time order.
+    Venues and artists are filtered on their own state and genres, in id order, and
+    have no date range.
+    """
+    if kind == 'shows':
+        shows = show_history()
+        query = select(*show_export_columns(shows)) \
+            .join(Venue, Venue.id == shows.c.venue_id) \
+            .join(Artist, Artist.id == shows.c.artist_id)
+        if start is not None:
+            query = query.where(shows.c.start_time >= start)
+        if end is not None:
+            query = query.where(shows.c.start_time < end)
+        state_column, genre_column = Venue.state, Artist.genres
+        query = query.order_by(shows.c.start_time, shows.c.id)
+    else:
+        query = select(*export_columns[kind])
+        if start is not None or end is not None:
+            raise ValueError(f'{kind.capitalize()} cannot be filtered on a date range.')
+        model = Venue if kind == 'venues' else Artist
+        state_column, genre_column = model.state, model.genres
+        query = query.order_by(model.id)
+    if state:
+        query = query.where(state_column == state)
+    if genre:
+        query = query.where(genre_column.has_any([genre]))
+    return query
+
+
+# ----------------------------------------------------------------------------#
+# Serialization.
+# ----------------------------------------------------------------------------#
+def _csv_value(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'strftime'):
+        return value.strftime(datetime_format)
+    return value
+
+
+def _json_value(value):
+    return value.strftime(datetime_format)
+
+
+def stream_export(connection, query, format, batch_size=1000):
+    """Yield the rows of ``query`` serialized as CSV or NDJSON, a batch at a time.
+
+    The rows are read through a server-side cursor ``batch_size`` at a time, and each
+    batch is serialized and yielded before the next one is fetched, so memory stays
+    bounded by the batch whatever the size of the export.
+    """
+    result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(query)
+    try:
+        keys = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == 'csv':
+            writer.writerow(keys)
+            yield buffer.getvalue()
+        for rows in result.partitions(batch_size):
+            buffer.seek(0)
+            buffer.truncate()
+            if format == 'csv':
+                writer.writerows([_csv_value(value) for value in row] for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(keys, row)), default=_json_value))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+    finally:
+        result.close()
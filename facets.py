@@ -0,0 +1,96 @@
+from sqlalchemy import cast, func, literal, select, union_all
+
+import genres
+from forms import genre_choices, state_choices
+from models import db
+
+# Values counted by every facet, in display order
+facet_values = {
+    'genre': [value for value, label in genre_choices],
+    'state': [value for value, label in state_choices],
+}
+
+
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+# A facet keeps the rows holding any of its selected values: genres through a
+# bitwise AND of the genre mask, see genres.py, states through the btree index on
+# state.
+
+def facet_conditions(model, selected):
+    """Return the ``{facet: condition}`` of the facets with values in ``selected``.
+
+    ``selected`` maps each facet to its selected values.
+    """
+    conditions = {}
+    if selected.get('genre'):
+        conditions['genre'] = model.genres.has_any(selected['genre'])
+    if selected.get('state'):
+        conditions['state'] = model.state.in_(selected['state'])
+    return conditions
+
+
+def parse_selected(args):
+    """Read the facet values of ``?genre=&state=``, raising ValueError on unknown ones."""
+    selected = {}
+    for facet, values in facet_values.items():
+        requested = args.getlist(facet)
+        unknown = [value for value in requested if value not in values]
+        if unknown:
+            raise ValueError(f"Unknown {facet}: {', '.join(unknown)}")
+        selected[facet] = list(dict.fromkeys(requested))
+    return selected
+
+
+# ----------------------------------------------------------------------------#
+# Counts.
+# ----------------------------------------------------------------------------#
+def facet_counts(model, selected):
+    """Count the ``model`` rows of every facet value, in one grouped statement.
+
+    Each facet is counted under the selections of the other facets only, so its
+    counts tell how many rows selecting one more of its values would add. Returns
+    ``{facet: {value: count}}`` holding every value of ``facet_values``.
+    """
+    conditions = facet_conditions(model, selected)
+    # Rows are counted per genre mask, a few hundred combinations at most, and the
+    # counts of every mask added to each of its genres below. The mask is cast to
+    # text to share its column with the states.
+    genre_counts = select(literal('genre').label('facet'), cast(model.genres, db.String).label('value'),
+                          func.count().label('count')) \
+        .where(*[condition for facet, condition in conditions.items() if facet != 'genre']) \
+        .group_by(model.genres)
+    state_counts = select(literal('state').label('facet'), model.state.label('value'),
+                          func.count().label('count')) \
+        .where(*[condition for facet, condition in conditions.items() if facet != 'state']) \
+        .group_by(model.state)
+
+    counts = {facet: dict.fromkeys(values, 0) for facet, values in facet_values.items()}
+    for facet, value, count in db.session.execute(union_all(genre_counts, state_counts)):
+        if facet == 'genre':
+            for name in genres.decode(int(value)):
+                counts['genre'][name] += count
+        elif value in counts[facet]:
+            counts[facet][value] = count
+    return counts
+
+
+def facet_options(counts, selected):
+    """Build the facet links of a list page from ``facet_counts()``.
+
+    Every option carries the query arguments of the page with its value toggled.
+    """
+    options = {}
+    for facet, values in counts.items():
+        options[facet] = []
+        for value, count in values.items():
+            params = {name: list(chosen) for name, chosen in selected.items() if chosen}
+            chosen = params.setdefault(facet, [])
+            is_selected = value in chosen
+            if is_selected:
+                chosen.remove(value)
+            else:
+                chosen.append(value)
+            options[facet].append({'value': value, 'count': count, 'selected': is_selected, 'params': params})
+    return options
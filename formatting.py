@@ -0,0 +1,66 @@
+import os
+from functools import lru_cache
+
+import babel
+import babel.dates
+import dateutil.parser
+from jinja2 import FileSystemBytecodeCache
+
+# Named patterns of the datetime filter
+datetime_formats = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+# Distinct (value, format) pairs remembered by format_datetime. Show pages repeat
+# the same few start times, one entry is a datetime and a short string.
+memo_size = 4096
+
+locale = babel.Locale.parse('en')
+# Parsed once instead of on every call, none of them renders a time zone
+patterns = {name: babel.dates.parse_pattern(pattern) for name, pattern in datetime_formats.items()}
+
+
+# ----------------------------------------------------------------------------#
+# Datetime filter.
+# ----------------------------------------------------------------------------#
+@lru_cache(maxsize=memo_size)
+def format_datetime(value, format='medium'):
+    """Format a datetime, or a string dateutil can parse, with a named or babel pattern."""
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    if format in patterns and hasattr(value, 'hour'):
+        return patterns[format].apply(value, locale)
+    return babel.dates.format_datetime(value, datetime_formats.get(format, format), locale=locale)
+
+
+def format_show_times(shows, format='medium'):
+    """Return ``(show, formatted start time)`` pairs, each distinct start time formatted once.
+
+    The shows are left untouched, they may be shared through the detail cache.
+    """
+    formatted = {start_time: format_datetime(start_time, format)
+                 for start_time in {show['start_time'] for show in shows}}
+    return [(show, formatted[show['start_time']]) for show in shows]
+
+
+# ----------------------------------------------------------------------------#
+# Template bytecode cache.
+# ----------------------------------------------------------------------------#
+def bytecode_cache(directory):
+    """Return a cache keeping compiled templates in ``directory`` across processes.
+
+    Workers started after the first one, or after ``flask compile-templates``, load
+    the compiled templates instead of compiling them again. Entries are keyed by the
+    template source checksum, so edited templates are compiled anew.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def compile_templates(environment):
+    # Loading a template stores its bytecode in the cache of the environment
+    names = environment.list_templates(extensions=('html',))
+    for name in names:
+        environment.get_template(name)
+    return names
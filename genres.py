@@ -0,0 +1,33 @@
+from forms import genre_choices
+
+# ----------------------------------------------------------------------------#
+# Genre bits.
+# ----------------------------------------------------------------------------#
+# Venue and artist genres are stored as an integer bitmask, one bit per genre in
+# the order of forms.genre_choices, and the genre table maps every bit to its name
+# for SQL. Stored masks depend on that order: new genres must be appended, and need
+# a migration inserting their row into the genre table.
+
+genre_names = tuple(value for value, label in genre_choices)
+genre_masks = {name: 1 << index for index, name in enumerate(genre_names)}
+
+
+def encode(names):
+    """Return the bitmask of the genre ``names``, raising ValueError on unknown ones."""
+    mask = 0
+    for name in names:
+        try:
+            mask |= genre_masks[name]
+        except KeyError:
+            raise ValueError(f'Unknown genre: {name}') from None
+    return mask
+
+
+def decode(mask):
+    """Return the genre names set in ``mask``, in the order of forms.genre_choices."""
+    return [name for name in genre_names if mask & genre_masks[name]]
+
+
+def has_any(mask, wanted):
+    """Tell whether ``mask`` holds any of the genres of the ``wanted`` bitmask."""
+    return mask & wanted != 0
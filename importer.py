@@ -0,0 +1,313 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+
+import bookings
+import counters
+import genres
+from cache import detail_cache, venue_key, artist_key
+from conditional import bump
+from forms import ArtistForm, ShowForm, VenueForm
+from models import Artist, Show, Venue
+
+# Strings read as a checked box, BooleanField itself reads 'False' as checked
+boolean_fields = frozenset(['seeking_talent', 'seeking_venue'])
+true_values = frozenset(['1', 'true', 't', 'yes', 'y', 'on'])
+
+
+# ----------------------------------------------------------------------------#
+# Input files.
+# ----------------------------------------------------------------------------#
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    raise ValueError(f'Cannot tell the format of {path}, use --format.')
+
+
+def read_rows(input_file, format):
+    """Yield the rows of a CSV or NDJSON file one at a time, as dicts.
+
+    CSV files have a header row and list the genres of a row comma separated in a
+    single cell. NDJSON lines hold one object each, genres being a list.
+    """
+    if format == 'csv':
+        for row in csv.DictReader(input_file):
+            if row.get('genres'):
+                row['genres'] = [genre.strip() for genre in row['genres'].split(',') if genre.strip()]
+            yield row
+    else:
+        for line in input_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+# ----------------------------------------------------------------------------#
+# Validation.
+# ----------------------------------------------------------------------------#
+def _formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None or value == '':
+            continue
+        if key in boolean_fields:
+            # Unchecked boxes are absent from posted forms
+            if str(value).lower() in true_values:
+                formdata.add(key, 'y')
+        elif isinstance(value, list):
+            for item in value:
+                formdata.add(key, str(item))
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def _venue_values(data):
+    return {
+        'name': data['name'],
+        'city': data['city'],
+        'state': data['state'],
+        'address': data['address'],
+        'phone': data['phone'],
+        'image_link': data['image_link'],
+        'genres': data['genres'],
+        'facebook_link': data['facebook_link'],
+        'website': data['website_link'],
+        'seeking_talent': data['seeking_talent'],
+        'seeking_description': data['seeking_description']
+    }, {}
+
+
+def _artist_values(data):
+    return {
+        'name': data['name'],
+        'city': data['city'],
+        'state': data['state'],
+        'phone': data['phone'],
+        'image_link': data['image_link'],
+        'genres': data['genres'],
+        'facebook_link': data['facebook_link'],
+        'website': data['website_link'],
+        'seeking_venue': data['seeking_venue'],
+        'seeking_description': data['seeking_description']
+    }, {}
+
+
+def _show_values(data):
+    # ShowForm leaves the ids unchecked, their existence is checked per batch
+    errors = {}
+    values = {'start_time': data['start_time']}
+    for field in ('venue_id', 'artist_id'):
+        try:
+            values[field] = int(data[field])
+        except (TypeError, ValueError):
+            errors[field] = ['Not a valid id.']
+    return values, errors
+
+
+importers = {
+    'venues': (VenueForm, Venue, _venue_values),
+    'artists': (ArtistForm, Artist, _artist_values),
+    'shows': (ShowForm, Show, _show_values),
+}
+
+
+def validate_row(kind, row):
+    """Validate ``row`` with the form creating a ``kind`` row through the site.
+
+    Returns ``(values, errors)``: the column values to insert, or None and the errors
+    by field as in ``form.errors``. The website is read from ``website_link`` as in
+    the forms, or from ``website`` as in the table.
+    """
+    form_class, model, to_values = importers[kind]
+    row = dict(row)
+    if 'website' in row and 'website_link' not in row:
+        row['website_link'] = row.pop('website')
+    form = form_class(formdata=_formdata(row), meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    values, errors = to_values(form.data)
+    if errors:
+        return None, errors
+    # Empty optional fields are stored as NULL, which is all COPY can tell apart
+    return {column: None if value == '' else value for column, value in values.items()}, {}
+
+
+# ----------------------------------------------------------------------------#
+# Inserts.
+# ----------------------------------------------------------------------------#
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        # Genre names, copied as the bitmask the column stores, see genres.py
+        return genres.encode(value)
+    return value
+
+
+def _copy_rows(connection, table, rows):
+    # COPY ... FROM STDIN reads an unquoted empty field as NULL
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def insert_rows(connection, table, rows):
+    """Insert ``rows`` with COPY on Postgres and a single executemany elsewhere."""
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        _copy_rows(connection, table, rows)
+    else:
+        connection.execute(table.insert(), rows)
+
+
+def _missing_ids(connection, model, ids):
+    found = connection.execute(select(model.id).where(model.id.in_(ids))).scalars()
+    return set(ids) - set(found)
+
+
+def _batch_conflict(booked, values, duration):
+    # Shows of the batch kept so far, by venue and by artist
+    for kind in ('venue', 'artist'):
+        for show_start_time in booked.get((kind, values[f'{kind}_id']), ()):
+            if abs(show_start_time - values['start_time']) < duration:
+                return kind
+    return None
+
+
+def _insert_batch(connection, kind, batch, show_duration):
+    # batch holds (index, row, values) tuples, returns the inserted values and the
+    # rows rejected meanwhile
+    rejected = []
+    if kind == 'shows':
+        missing_venues = _missing_ids(connection, Venue, {values['venue_id'] for index, row, values in batch})
+        missing_artists = _missing_ids(connection, Artist, {values['artist_id'] for index, row, values in batch})
+        kept = []
+        booked = {}
+        for index, row, values in batch:
+            errors = {}
+            if values['venue_id'] in missing_venues:
+                errors['venue_id'] = ['No venue with this id.']
+            if values['artist_id'] in missing_artists:
+                errors['artist_id'] = ['No artist with this id.']
+            if not errors:
+                minutes = int(show_duration.total_seconds() // 60)
+                # Double bookings are refused like the show form refuses them
+                conflict = bookings.booking_conflict(connection, values['artist_id'], values['venue_id'],
+                                                     values['start_time'], show_duration)
+                if conflict is not None:
+                    errors['start_time'] = [f'The {conflict[0]} already has show {conflict[1]} '
+                                            f'less than {minutes} minutes apart.']
+                else:
+                    conflict = _batch_conflict(booked, values, show_duration)
+                    if conflict is not None:
+                        errors['start_time'] = [f'The {conflict} already has a show of this file '
+                                                f'less than {minutes} minutes apart.']
+            if errors:
+                rejected.append((index, row, errors))
+            else:
+                kept.append((index, row, values))
+                for owner in ('venue', 'artist'):
+                    booked.setdefault((owner, values[f'{owner}_id']), []).append(values['start_time'])
+        batch = kept
+
+    model = importers[kind][1]
+    rows = [values for index, row, values in batch]
+    insert_rows(connection, model.__table__, rows)
+    if kind == 'shows':
+        # COPY and executemany bypass the ORM flush hooks
+        counters.apply_show_changes(
+            connection, added=[(row['venue_id'], row['artist_id'], row['start_time']) for row in rows]
+        )
+    if rows:
+        bump(connection, model.__tablename__)
+    return rows, rejected
+
+
+# ----------------------------------------------------------------------------#
+# Import.
+# ----------------------------------------------------------------------------#
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return {'rows': 0, 'inserted': 0, 'rejected': 0}
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def _write_checkpoint(path, checkpoint):
+    # Replaced atomically, an interrupted write leaves the previous checkpoint
+    with open(path + '.tmp', 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(path + '.tmp', path)
+
+
+def import_file(engine, kind, input_file, format, rejects_file, checkpoint_path,
+                show_duration, batch_size=5000, progress=lambda checkpoint: None):
+    """Validate and insert the ``kind`` rows of ``input_file``, a batch per transaction.
+
+    Only one batch is held in memory. Rejected rows are written to ``rejects_file``
+    as NDJSON objects holding their index, row and errors. After every committed
+    batch the number of input rows consumed is saved to ``checkpoint_path``, and a
+    later call with the same checkpoint skips them. A crash between a commit and its
+    checkpoint imports that batch twice. Shows starting less than ``show_duration``
+    from another show of their venue or artist, stored or earlier in the file, are
+    rejected. Returns the final checkpoint.
+    """
+    checkpoint = read_checkpoint(checkpoint_path)
+    rows = enumerate(read_rows(input_file, format), start=1)
+    # Skip the rows imported by an earlier run
+    for _ in islice(rows, checkpoint['rows']):
+        pass
+
+    while True:
+        batch = []
+        rejected = []
+        consumed = 0
+        for index, row in islice(rows, batch_size):
+            consumed += 1
+            values, errors = validate_row(kind, row)
+            if errors:
+                rejected.append((index, row, errors))
+            else:
+                batch.append((index, row, values))
+        if not consumed:
+            return checkpoint
+
+        if batch:
+            with engine.begin() as connection:
+                inserted, missing = _insert_batch(connection, kind, batch, show_duration)
+            if kind == 'shows':
+                # The committed shows change the pages of their venues and artists
+                venue_ids = {row['venue_id'] for row in inserted}
+                artist_ids = {row['artist_id'] for row in inserted}
+                detail_cache.delete(*[venue_key(venue_id) for venue_id in venue_ids],
+                                    *[artist_key(artist_id) for artist_id in artist_ids])
+            rejected.extend(missing)
+            checkpoint['inserted'] += len(inserted)
+        for index, row, errors in sorted(rejected, key=lambda rejected_row: rejected_row[0]):
+            rejects_file.write(json.dumps({'index': index, 'row': row, 'errors': errors}, default=str) + '\n')
+        rejects_file.flush()
+        checkpoint['rejected'] += len(rejected)
+        checkpoint['rows'] += consumed
+        _write_checkpoint(checkpoint_path, checkpoint)
+        progress(checkpoint)
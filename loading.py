@@ -0,0 +1,52 @@
+from sqlalchemy.orm import configure_mappers, load_only, raiseload
+
+from models import Artist, Venue
+
+# The shows backrefs only exist on Venue and Artist once the mappers are configured
+configure_mappers()
+
+
+# ----------------------------------------------------------------------------#
+# Loading profiles.
+# ----------------------------------------------------------------------------#
+# The show relationships are lazy by default. Each endpoint that loads Venue or
+# Artist entities opts into one of these profiles, which load exactly what its
+# template renders and raise on any other relationship access instead of silently
+# issuing one more query per row. Search does not load entities at all, it selects
+# columns directly, see search.py.
+
+profiles = {
+    Venue: {
+        # Index pages render the id and name only
+        'list': (
+            load_only(Venue.id, Venue.name),
+            raiseload('*')
+        ),
+        # Detail pages read the shows, archived ones included, with one extra query
+        # on show_history() rather than through the relationship, see queries.py
+        'detail': (
+            raiseload('*'),
+        ),
+        # Edit forms read the columns of the row only
+        'edit': (
+            raiseload('*'),
+        )
+    },
+    Artist: {
+        'list': (
+            load_only(Artist.id, Artist.name),
+            raiseload('*')
+        ),
+        'detail': (
+            raiseload('*'),
+        ),
+        'edit': (
+            raiseload('*'),
+        )
+    }
+}
+
+
+def profile(model, name):
+    """Return the loader options of the ``name`` profile of ``model``."""
+    return profiles[model][name]
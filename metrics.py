@@ -0,0 +1,208 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+
+from routing import engines
+
+# Upper bounds, in seconds, of the histogram buckets
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ----------------------------------------------------------------------------#
+# Registry.
+# ----------------------------------------------------------------------------#
+class Registry:
+    """Thread safe store of counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def add_collector(self, collector):
+        """Register a callable returning ``(name, labels, value)`` gauges, read on every render."""
+        self._collectors.append(collector)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(latency_buckets), 0.0, 0]
+            index = bisect_left(latency_buckets, value)
+            if index < len(latency_buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(buckets), total, count)
+                          for key, (buckets, total, count) in self._histograms.items()}
+            collectors = list(self._collectors)
+        gauges = {}
+        for collector in collectors:
+            for name, labels, value in collector():
+                gauges[(name, tuple(sorted(labels.items())))] = value
+        lines = []
+        for name, (kind, text) in sorted(self._help.items()):
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind in ('counter', 'gauge'):
+                values = counters if kind == 'counter' else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {value}')
+            else:
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(latency_buckets, buckets):
+                        cumulative += bucket_count
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", repr(bound)),))} {cumulative}')
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+                    lines.append(f'{name}_sum{_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+registry.describe('fyyur_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+registry.describe('fyyur_requests_total', 'counter', 'Requests by endpoint and status code.')
+registry.describe('fyyur_sql_statements_total', 'counter', 'SQL statements executed by endpoint.')
+registry.describe('fyyur_sql_duration_seconds_total', 'counter', 'Time spent executing SQL by endpoint.')
+registry.describe('fyyur_template_render_seconds', 'histogram', 'Jinja render time by template.')
+registry.describe('fyyur_pool_checkout_wait_seconds', 'histogram',
+                  'Time spent waiting for a pooled database connection by endpoint.')
+
+
+def _endpoint():
+    # Work done outside of a request, e.g. in CLI commands, is grouped together
+    if has_request_context():
+        return request.endpoint or 'none'
+    return 'none'
+
+
+# ----------------------------------------------------------------------------#
+# Instrumentation.
+# ----------------------------------------------------------------------------#
+class TimedTemplate(Template):
+    # Only the top level render() of a page is timed, the layouts it extends are
+    # rendered as part of it
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            registry.observe('fyyur_template_render_seconds', {'template': self.name},
+                             time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    labels = {'endpoint': _endpoint()}
+    registry.inc('fyyur_sql_statements_total', labels)
+    start = getattr(context, '_metrics_start', None)
+    if start is not None:
+        registry.inc('fyyur_sql_duration_seconds_total', labels, time.perf_counter() - start)
+
+
+def _instrument_pool(pool):
+    # Pools have no event before a checkout starts, so the method fetching a
+    # connection from the pool is timed instead
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            registry.observe('fyyur_pool_checkout_wait_seconds', {'endpoint': _endpoint()},
+                             time.perf_counter() - start)
+
+    pool._do_get = timed_do_get
+
+
+class Metrics:
+    """Per-endpoint request, SQL, template and pool metrics exposed on ``/metrics``.
+
+    Nothing is registered unless ``METRICS_ENABLED`` is set, so a disabled app pays no
+    per-request cost and serves no ``/metrics`` route.
+    """
+
+    def __init__(self, app=None):
+        self._instrumented_engines = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED'):
+            return
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+
+    def instrument_engine(self, engine):
+        if id(engine) in self._instrumented_engines:
+            return
+        self._instrumented_engines.add(id(engine))
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        _instrument_pool(engine.pool)
+
+    def _before_request(self):
+        # The engines are created lazily on first use, so they are instrumented here
+        for engine in engines():
+            self.instrument_engine(engine)
+        g.metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            endpoint = _endpoint()
+            registry.observe('fyyur_request_duration_seconds', {'endpoint': endpoint},
+                             time.perf_counter() - start)
+            registry.inc('fyyur_requests_total', {'endpoint': endpoint,
+                                                  'status': response.status_code})
+        return response
+
+    def export(self):
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
@@ -0,0 +1,37 @@
+"""hot column indexes
+
+Revision ID: 03c640139664
+Revises: 6238c42d8cc4
+Create Date: 2026-10-17 11:26:08.941527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '03c640139664'
+down_revision = '6238c42d8cc4'
+branch_labels = None
+depends_on = None
+
+indexes = [
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time']),
+    ('ix_show_start_time_id', 'show', ['start_time', 'id']),
+    ('ix_venue_state_city', 'venue', ['state', 'city']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY does not lock the table against writes, but cannot
+    # run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in indexes:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(indexes):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,105 @@
+"""partition shows by month
+
+Revision ID: 18c9e8655625
+Revises: d7ef95d05cf6
+Create Date: 2026-10-17 15:21:44.602913
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '18c9e8655625'
+down_revision = 'd7ef95d05cf6'
+branch_labels = None
+depends_on = None
+
+# Months partitioned ahead of the current one, `flask maintain-show-partitions`
+# creates the later ones
+months_ahead = 3
+
+indexes = {
+    'show': (
+        ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+        ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+        ('ix_show_start_time_id', ['start_time', 'id']),
+    ),
+    'show_archive': (
+        ('ix_show_archive_venue_id_start_time', ['venue_id', 'start_time']),
+        ('ix_show_archive_artist_id_start_time', ['artist_id', 'start_time']),
+    ),
+}
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _create_show_table(name, partitioned, id_default=None):
+    # The primary key of a partitioned table must hold its partition key
+    op.create_table(name,
+    sa.Column('id', sa.Integer(), server_default=id_default, nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], name=f'{name}_artist_id_fkey', ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], name=f'{name}_venue_id_fkey', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint(*(['id', 'start_time'] if partitioned else ['id']), name=f'{name}_pkey'),
+    **({'postgresql_partition_by': 'RANGE (start_time)'} if partitioned else {})
+    )
+
+
+def upgrade():
+    connection = op.get_bind()
+    op.rename_table('show', 'show_unpartitioned')
+    for index_name, columns in indexes['show']:
+        op.drop_index(index_name, table_name='show_unpartitioned')
+    op.drop_constraint('show_pkey', 'show_unpartitioned', type_='primary')
+    # The id sequence outlives the table it was created with
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+
+    _create_show_table('show', True, sa.text("nextval('show_id_seq')"))
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    _create_show_table('show_archive', True)
+    for table, table_indexes in indexes.items():
+        for index_name, columns in table_indexes:
+            op.create_index(index_name, table, columns)
+
+    # One partition per month from the first show to a few months ahead, and a
+    # default partition for the shows outside of them
+    first = connection.execute(sa.text('SELECT min(start_time) FROM show_unpartitioned')).scalar()
+    now = datetime.now()
+    month = datetime((first or now).year, (first or now).month, 1)
+    last = _add_months(datetime(now.year, now.month, 1), months_ahead)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(f"CREATE TABLE show_{month:%Y_%m} PARTITION OF show "
+                   f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')")
+        month = upper
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+
+    op.execute('INSERT INTO show (id, artist_id, venue_id, start_time) '
+               'SELECT id, artist_id, venue_id, start_time FROM show_unpartitioned')
+    op.drop_table('show_unpartitioned')
+
+
+def downgrade():
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY NONE')
+    _create_show_table('show_unpartitioned', False, sa.text("nextval('show_id_seq')"))
+    op.execute('INSERT INTO show_unpartitioned (id, artist_id, venue_id, start_time) '
+               'SELECT id, artist_id, venue_id, start_time FROM show '
+               'UNION ALL SELECT id, artist_id, venue_id, start_time FROM show_archive')
+    # Dropping a partitioned table drops its partitions
+    op.drop_table('show_archive')
+    op.drop_table('show')
+    op.rename_table('show_unpartitioned', 'show')
+    op.execute('ALTER TABLE show RENAME CONSTRAINT show_unpartitioned_pkey TO show_pkey')
+    op.execute('ALTER TABLE show RENAME CONSTRAINT show_unpartitioned_artist_id_fkey TO show_artist_id_fkey')
+    op.execute('ALTER TABLE show RENAME CONSTRAINT show_unpartitioned_venue_id_fkey TO show_venue_id_fkey')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    for index_name, columns in indexes['show']:
+        op.create_index(index_name, 'show', columns)
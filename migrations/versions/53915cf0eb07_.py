@@ -0,0 +1,34 @@
+"""search indexes
+
+Revision ID: 53915cf0eb07
+Revises: 33cc1e5b768d
+Create Date: 2026-10-17 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '53915cf0eb07'
+down_revision = '33cc1e5b768d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        op.create_index(f'ix_{table}_name_trgm', table, ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index(f'ix_{table}_city_trgm', table, ['city'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False,
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        op.drop_index(f'ix_{table}_city_trgm', table_name=table)
+        op.drop_index(f'ix_{table}_name_trgm', table_name=table)
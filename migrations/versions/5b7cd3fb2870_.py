@@ -0,0 +1,48 @@
+"""show counters
+
+Revision ID: 5b7cd3fb2870
+Revises: 03c640139664
+Create Date: 2026-10-17 12:40:19.506112
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7cd3fb2870'
+down_revision = '03c640139664'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    state = op.create_table('show_counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Count the existing shows relative to the initial rollover time
+    rolled_at = datetime.now()
+    op.bulk_insert(state, [{'id': 1, 'rolled_at': rolled_at}])
+    for table, column in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.execute(sa.text(
+            f'UPDATE {table} SET '
+            f'upcoming_shows_count = (SELECT count(*) FROM show '
+            f'WHERE show.{column} = {table}.id AND show.start_time > :rolled_at), '
+            f'past_shows_count = (SELECT count(*) FROM show '
+            f'WHERE show.{column} = {table}.id AND show.start_time <= :rolled_at)'
+        ).bindparams(rolled_at=rolled_at))
+
+
+def downgrade():
+    op.drop_table('show_counter_state')
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,35 @@
+"""table versions
+
+Revision ID: 6238c42d8cc4
+Revises: 53915cf0eb07
+Create Date: 2026-10-17 10:02:51.730419
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6238c42d8cc4'
+down_revision = '53915cf0eb07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_version = op.create_table('table_version',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_version, [
+        {'name': name, 'version': 0, 'updated_at': datetime.utcnow()}
+        for name in ('venue', 'artist', 'show')
+    ])
+
+
+def downgrade():
+    op.drop_table('table_version')
@@ -0,0 +1,69 @@
+"""genre bitmasks
+
+Revision ID: 9c4e2b7a51d3
+Revises: e1255f904477
+Create Date: 2026-10-17 18:42:07.316254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2b7a51d3'
+down_revision = 'e1255f904477'
+branch_labels = None
+depends_on = None
+
+# Genres in bit order, as in genres.py when this revision was written
+genre_names = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+    'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+    'Rock n Roll', 'Soul', 'Other',
+)
+
+
+def upgrade():
+    connection = op.get_bind()
+    genre = op.create_table('genre',
+    sa.Column('mask', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('mask'),
+    sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genre, [{'mask': 1 << index, 'name': name} for index, name in enumerate(genre_names)])
+
+    for table in ('venue', 'artist'):
+        # A genre without a bit would be lost by the conversion
+        unknown = connection.execute(sa.text(
+            f'SELECT DISTINCT g.name FROM {table}, unnest(genres) AS g(name) '
+            f'WHERE g.name NOT IN (SELECT genre.name FROM genre)'
+        )).scalars().all()
+        if unknown:
+            raise RuntimeError(f"Unknown genres in {table}: {', '.join(unknown)}")
+
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        op.add_column(table, sa.Column('genre_mask', sa.Integer(), nullable=True))
+        op.execute(f'UPDATE {table} SET genre_mask = '
+                   f'(SELECT coalesce(bit_or(genre.mask), 0) FROM genre WHERE genre.name = ANY({table}.genres))')
+        op.drop_column(table, 'genres')
+        op.alter_column(table, 'genre_mask', new_column_name='genres', nullable=False)
+        # One partial index per genre bit serves the bit tests of the searches and
+        # filters, a bitwise AND cannot use any other index
+        for bit in range(len(genre_names)):
+            op.create_index(f'ix_{table}_genre_bit_{bit}', table, ['id'], unique=False,
+                            postgresql_where=sa.text(f'genres & {1 << bit} <> 0'))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        for bit in range(len(genre_names)):
+            op.drop_index(f'ix_{table}_genre_bit_{bit}', table_name=table)
+        op.add_column(table, sa.Column('genre_names', sa.ARRAY(sa.String(length=120)), nullable=True))
+        op.execute(f'UPDATE {table} SET genre_names = '
+                   f'ARRAY(SELECT genre.name FROM genre WHERE {table}.genres & genre.mask <> 0 ORDER BY genre.mask)')
+        op.drop_column(table, 'genres')
+        op.alter_column(table, 'genre_names', new_column_name='genres', nullable=False)
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False,
+                        postgresql_using='gin')
+    op.drop_table('genre')
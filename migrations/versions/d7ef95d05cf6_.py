@@ -0,0 +1,35 @@
+"""cascade show deletes
+
+Revision ID: d7ef95d05cf6
+Revises: 5b7cd3fb2870
+Create Date: 2026-10-17 14:02:37.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7ef95d05cf6'
+down_revision = '5b7cd3fb2870'
+branch_labels = None
+depends_on = None
+
+# Named as Postgres named the constraints of the initial migration
+foreign_keys = (
+    ('show_venue_id_fkey', 'venue', 'venue_id'),
+    ('show_artist_id_fkey', 'artist', 'artist_id'),
+)
+
+
+def upgrade():
+    # Deleting a venue or an artist deletes its shows in the same statement
+    for name, table, column in foreign_keys:
+        op.drop_constraint(name, 'show', type_='foreignkey')
+        op.create_foreign_key(name, 'show', table, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    for name, table, column in foreign_keys:
+        op.drop_constraint(name, 'show', type_='foreignkey')
+        op.create_foreign_key(name, 'show', table, [column], ['id'])
@@ -0,0 +1,27 @@
+"""artist state index
+
+Revision ID: e1255f904477
+Revises: 18c9e8655625
+Create Date: 2026-10-17 16:05:12.480391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1255f904477'
+down_revision = '18c9e8655625'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The state facet of /artists, venues are served by ix_venue_state_city
+    with op.get_context().autocommit_block():
+        op.create_index('ix_artist_state', 'artist', ['state'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artist_state', table_name='artist', postgresql_concurrently=True)
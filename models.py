@@ -1,7 +1,66 @@
-from flask_sqlalchemy import SQLAlchemy
+import sqlite3
 
-# Create the db object
-db = SQLAlchemy()
+from sqlalchemy import event, or_, type_coerce
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import TypeDecorator
+
+import genres
+from routing import RoutingSQLAlchemy
+
+# Create the db object, its session reads from the replicas, see routing.py
+db = RoutingSQLAlchemy()
+
+
+class GenreSet(TypeDecorator):
+    """Genre names stored as an integer bitmask, see genres.py.
+
+    Python reads and writes lists of genre names, as the forms and templates do.
+    SQL filters with ``column.has_any(names)``, a bitwise AND.
+    """
+
+    impl = db.Integer
+    cache_ok = True
+
+    class comparator_factory(TypeDecorator.Comparator):
+        def has_any(self, other):
+            """Match the rows holding any of ``other``, genre names or an SQL mask.
+
+            Names are tested one bit at a time, each test matching the predicate of
+            a partial index of search_indexes().
+            """
+            column = type_coerce(self.expr, db.Integer)
+            if isinstance(other, (list, tuple, set)):
+                return or_(*[column.op('&')(genres.encode([name])) != 0 for name in other])
+            return column.op('&')(other) != 0
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else genres.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else genres.decode(value)
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys, and so ON DELETE CASCADE, unless asked per connection
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+
+def search_indexes(table):
+    # Trigram indexes serve ILIKE '%term%' on name and city, and a partial index per
+    # genre bit serves the genre tests of GenreSet.has_any(), see search.py
+    return (
+        db.Index(f'ix_{table}_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index(f'ix_{table}_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+    ) + tuple(
+        db.Index(f'ix_{table}_genre_bit_{bit}', 'id',
+                 postgresql_where=db.text(f'genres & {1 << bit} <> 0'),
+                 sqlite_where=db.text(f'genres & {1 << bit} <> 0'))
+        for bit in range(len(genres.genre_names))
+    )
 
 
 # ----------------------------------------------------------------------------#
@@ -9,6 +68,11 @@ db = SQLAlchemy()
 # ----------------------------------------------------------------------------#
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = search_indexes('venue') + (
+        # Serves the (city, state) grouping and ordering of the /venues areas, and
+        # the state facet
+        db.Index('ix_venue_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -21,31 +85,114 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    genres = db.Column(db.ARRAY(db.String(120)), nullable=False)
+    genres = db.Column(GenreSet, nullable=False)
+    # Maintained by counters.py relative to ShowCounterState.rolled_at
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = search_indexes('artist') + (
+        # Serves the state facet of /artists
+        db.Index('ix_artist_state', 'state'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(120)), nullable=False)
+    genres = db.Column(GenreSet, nullable=False)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # Maintained by counters.py relative to ShowCounterState.rolled_at
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 
 class Show(db.Model):
     __tablename__ = 'show'
+    __table_args__ = (
+        # Upcoming/past shows of one venue or artist, and the show relationship loads
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        # Start time ranges and the (start_time, id) keyset order of /shows
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.ForeignKey('artist.id'), nullable=False)
-    venue_id = db.Column(db.ForeignKey('venue.id'), nullable=False)
+    # Deleting a venue or an artist deletes its shows in the database, see deletes.py
+    artist_id = db.Column(db.ForeignKey('artist.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.ForeignKey('venue.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
-    artist = db.relationship('Artist', backref=db.backref('shows', lazy="joined", cascade="all, delete-orphan"))
-    venue = db.relationship('Venue', backref=db.backref('shows', lazy="joined", cascade="all, delete-orphan"))
+    # Loaded lazily, endpoints opt into eager loading through the profiles in loading.py
+    artist = db.relationship('Artist', backref=db.backref('shows', cascade="all, delete-orphan",
+                                                          passive_deletes=True))
+    venue = db.relationship('Venue', backref=db.backref('shows', cascade="all, delete-orphan",
+                                                        passive_deletes=True))
+
+
+# Shows of the months moved out of the show partitions by `flask
+# maintain-show-partitions`, see partitions.py. On Postgres both tables are
+# partitioned by start_time with (id, start_time) primary keys, as set up by the
+# migrations. Past shows are read from both through show_history().
+show_archive = db.Table(
+    'show_archive',
+    db.Column('id', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('artist_id', db.ForeignKey('artist.id', ondelete='CASCADE'), nullable=False),
+    db.Column('venue_id', db.ForeignKey('venue.id', ondelete='CASCADE'), nullable=False),
+    db.Column('start_time', db.DateTime, primary_key=True),
+    db.Index('ix_show_archive_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_archive_artist_id_start_time', 'artist_id', 'start_time'),
+)
+
+
+def show_history():
+    """Return the shows and the archived shows as one subquery with the columns of Show."""
+    columns = ('id', 'artist_id', 'venue_id', 'start_time')
+    return db.union_all(
+        db.select(*(Show.__table__.c[column] for column in columns)),
+        db.select(*(show_archive.c[column] for column in columns))
+    ).subquery('show_history')
+
+
+class Genre(db.Model):
+    # Name of every genre bit, for the SQL reading the genre masks of venues and
+    # artists, see genres.py
+    __tablename__ = 'genre'
+
+    mask = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+@event.listens_for(Genre.__table__, 'after_create')
+def _insert_genres(target, connection, **kw):
+    # Tables built with db.create_all() start with every genre, the migration
+    # inserts them otherwise
+    connection.execute(target.insert(), [
+        {'mask': genres.genre_masks[name], 'name': name} for name in genres.genre_names
+    ])
+
+
+class TableVersion(db.Model):
+    # One row per catalog table, bumped whenever a flush writes to that table. Pages
+    # derive their ETag and Last-Modified validators from it, see conditional.py
+    __tablename__ = 'table_version'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class ShowCounterState(db.Model):
+    # Single row holding the time the show counters of venues and artists were last
+    # rolled over: shows starting after rolled_at count as upcoming, the others as
+    # past, see counters.py
+    __tablename__ = 'show_counter_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_at = db.Column(db.DateTime, nullable=False)
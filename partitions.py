@@ -0,0 +1,127 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+import counters
+
+# Monthly partitions are named after their table and month, e.g. show_2026_10
+partition_month = re.compile(r'_(\d{4})_(\d{2})$')
+
+
+# ----------------------------------------------------------------------------#
+# Months.
+# ----------------------------------------------------------------------------#
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_{month:%Y_%m}'
+
+
+# ----------------------------------------------------------------------------#
+# Partitions.
+# ----------------------------------------------------------------------------#
+# On Postgres the show table is partitioned by month of start_time, with a default
+# partition catching the rows of months without one. Upcoming shows only ever read
+# the partitions from the current month on. Months older than the archive cutoff are
+# detached from show and attached to show_archive, whose rows only the detail pages,
+# the exports and the counter checks read, through models.show_history().
+
+def is_partitioned(connection, table):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(
+        text('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))'),
+        {'table': table}
+    ).scalar()
+
+
+def monthly_partitions(connection, table):
+    """Return the ``{month: partition name}`` of the monthly partitions of ``table``."""
+    names = connection.execute(
+        text('SELECT child.relname FROM pg_inherits '
+             'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+             'WHERE pg_inherits.inhparent = to_regclass(:table)'),
+        {'table': table}
+    ).scalars()
+    partitions = {}
+    for name in names:
+        match = partition_month.search(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _bounds(month):
+    return f"FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+
+
+def create_partition(connection, month):
+    """Create the show partition of ``month``, moving its rows out of the default partition."""
+    name = partition_name('show', month)
+    connection.execute(text(f'CREATE TABLE {name} (LIKE show INCLUDING DEFAULTS)'))
+    # Attaching fails while the default partition holds rows of the month
+    connection.execute(
+        text(f'WITH moved AS (DELETE FROM show_default '
+             f'WHERE start_time >= :lower AND start_time < :upper '
+             f'RETURNING id, artist_id, venue_id, start_time) '
+             f'INSERT INTO {name} (id, artist_id, venue_id, start_time) SELECT * FROM moved'),
+        {'lower': month, 'upper': add_months(month, 1)}
+    )
+    connection.execute(text(f'ALTER TABLE show ATTACH PARTITION {name} FOR VALUES {_bounds(month)}'))
+    return name
+
+
+def archive_partition(connection, month):
+    """Move the show partition of ``month`` to show_archive, its rows stay readable there."""
+    name = partition_name('show', month)
+    connection.execute(text(f'ALTER TABLE show DETACH PARTITION {name}'))
+    connection.execute(text(f'ALTER TABLE show_archive ATTACH PARTITION {name} FOR VALUES {_bounds(month)}'))
+    return name
+
+
+def _past_default_months(connection, current):
+    # Months before ``current`` with rows in the default partition, e.g. seeded or
+    # imported history, or shows older than the first partition
+    months = connection.execute(
+        text("SELECT DISTINCT date_trunc('month', start_time) FROM show_default "
+             "WHERE start_time < :current"),
+        {'current': current}
+    ).scalars()
+    return sorted(months)
+
+
+def maintain(connection, months_ahead=3, archive_after=12, now=None):
+    """Create the partitions of the coming months and archive the old ones.
+
+    Partitions are created up to ``months_ahead`` months after the current one, and
+    for every past month still holding rows in the default partition. The ones
+    ending ``archive_after`` months or more before the current month are archived.
+    Months still counted as upcoming by the show counters are never archived, since
+    rollover() only reads the show table. Returns the names of the created and of
+    the archived partitions.
+    """
+    if not is_partitioned(connection, 'show'):
+        raise RuntimeError('The show table is not partitioned, run flask db upgrade on Postgres.')
+    current = month_start(now or datetime.now())
+    partitions = monthly_partitions(connection, 'show')
+
+    created = []
+    months = _past_default_months(connection, current) + [add_months(current, offset)
+                                                          for offset in range(months_ahead + 1)]
+    for month in months:
+        if month not in partitions:
+            partitions[month] = create_partition(connection, month)
+            created.append(partitions[month])
+
+    cutoff = min(add_months(current, -archive_after), month_start(counters.rolled_at(connection)))
+    archived = [archive_partition(connection, month) for month in sorted(partitions)
+                if add_months(month, 1) <= cutoff]
+    return created, archived
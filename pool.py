@@ -0,0 +1,74 @@
+from flask import has_app_context, render_template, request
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from metrics import registry
+from models import db
+
+
+# ----------------------------------------------------------------------------#
+# Pool statistics.
+# ----------------------------------------------------------------------------#
+def pool_status(engine):
+    """Return the live size, checked in/out and overflow connections of ``engine``'s pool.
+
+    Pools without a fixed size, like the ones used for SQLite, report None.
+    """
+    pool = engine.pool
+    status = {}
+    for name, method in (('size', 'size'), ('checked_in', 'checkedin'),
+                         ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+        status[name] = getattr(pool, method)() if hasattr(pool, method) else None
+    return status
+
+
+registry.describe('fyyur_pool_connections', 'gauge',
+                  'Connections of the database pool by state, overflow counts the ones above size.')
+
+
+def _collect_pool_status():
+    if not has_app_context():
+        return []
+    return [
+        ('fyyur_pool_connections', {'state': state}, value)
+        for state, value in pool_status(db.engine).items()
+        if value is not None
+    ]
+
+
+registry.add_collector(_collect_pool_status)
+
+
+# ----------------------------------------------------------------------------#
+# Fail fast.
+# ----------------------------------------------------------------------------#
+class PoolGuard:
+    """Answer 503 when a request cannot get a database connection in time.
+
+    The views catch their own database errors and turn them into 500s, so the
+    connection of every view declaring a ``@query_budget`` is checked out before the
+    view runs: a pool timeout or an unreachable database then reaches the error
+    handler instead of the view. The session keeps that connection for the view.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._reserve_connection)
+        app.register_error_handler(PoolTimeoutError, self._unavailable)
+        app.register_error_handler(OperationalError, self._unavailable)
+
+    def _reserve_connection(self):
+        view = self.app.view_functions.get(request.endpoint)
+        if getattr(view, 'query_budget', 0):
+            db.session.connection()
+
+    def _unavailable(self, error):
+        self.app.logger.error('Database unavailable: %s', error)
+        db.session.remove()
+        return render_template('errors/503.html'), 503, {'Retry-After': '5'}
+
+
+pool_guard = PoolGuard()
@@ -0,0 +1,281 @@
+from bisect import bisect_right
+from datetime import datetime
+
+from sqlalchemy import and_, tuple_
+
+from loading import profile
+from models import db, show_history, Artist, Show, Venue
+
+
+# ----------------------------------------------------------------------------#
+# Venues.
+# ----------------------------------------------------------------------------#
+def venue_areas(page=1, per_page=50, conditions=()):
+    """Return one page of areas, each holding its venues and upcoming show counts.
+
+    Areas are paginated first so the venue query only touches the venues of the
+    requested page. The venue rows and their ``num_upcoming_shows`` counter come
+    back from a single query and are bucketed into their area with one dict lookup.
+    Only the venues matching ``conditions``, e.g. the facet filters, are listed.
+    Returns ``(areas, has_next)``.
+    """
+    # Page through the distinct (city, state) pairs, fetching one extra row to
+    # know whether a next page exists
+    area_query = db.session.query(Venue.city, Venue.state) \
+        .filter(*conditions) \
+        .group_by(Venue.city, Venue.state) \
+        .order_by(Venue.state, Venue.city) \
+        .offset((page - 1) * per_page)
+    area_rows = area_query.limit(per_page + 1).all()
+    has_next = len(area_rows) > per_page
+    area_rows = area_rows[:per_page]
+
+    # Keep the page order of the areas, keyed for constant time lookups
+    areas = {}
+    for city, state in area_rows:
+        areas[(city, state)] = {
+            "city": city,
+            "state": state,
+            "venues": []
+        }
+    if not areas:
+        return [], has_next
+
+    page_areas = area_query.limit(per_page).subquery()
+
+    # One query for every venue in the page, upcoming show counts included
+    venue_rows = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count
+    ).join(
+        page_areas,
+        and_(Venue.city == page_areas.c.city, Venue.state == page_areas.c.state)
+    ).filter(
+        *conditions
+    ).order_by(
+        Venue.name, Venue.id
+    ).all()
+
+    for venue_id, name, city, state, num_upcoming_shows in venue_rows:
+        areas[(city, state)]['venues'].append(
+            {
+                'id': venue_id,
+                'name': name,
+                'num_upcoming_shows': num_upcoming_shows
+            }
+        )
+    return list(areas.values()), has_next
+
+
+# ----------------------------------------------------------------------------#
+# Detail pages.
+# ----------------------------------------------------------------------------#
+# The detail payloads hold every show of the venue or artist ordered by start time,
+# archived ones included, and are safe to cache: nothing in them depends on the
+# current time. split_shows() divides them into past and upcoming shows on every
+# request.
+
+def venue_detail(venue_id):
+    """Return the cacheable detail payload of a venue, or None if it does not exist."""
+    venue = Venue().query.options(*profile(Venue, 'detail')).get(venue_id)
+    if venue is None:
+        return None
+    history = show_history()
+    shows = db.session.query(Artist.id, Artist.name, Artist.image_link, history.c.start_time) \
+        .join(Artist, Artist.id == history.c.artist_id) \
+        .filter(history.c.venue_id == venue_id) \
+        .order_by(history.c.start_time, history.c.id) \
+        .all()
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "shows": [
+            {
+                "artist_id": artist_id,
+                "artist_name": artist_name,
+                "artist_image_link": artist_image_link,
+                "start_time": start_time
+            }
+            for artist_id, artist_name, artist_image_link, start_time in shows
+        ]
+    }
+
+
+def artist_detail(artist_id):
+    """Return the cacheable detail payload of an artist, or None if it does not exist."""
+    artist = Artist().query.options(*profile(Artist, 'detail')).get(artist_id)
+    if artist is None:
+        return None
+    history = show_history()
+    shows = db.session.query(Venue.id, Venue.name, Venue.image_link, history.c.start_time) \
+        .join(Venue, Venue.id == history.c.venue_id) \
+        .filter(history.c.artist_id == artist_id) \
+        .order_by(history.c.start_time, history.c.id) \
+        .all()
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "shows": [
+            {
+                "venue_id": venue_id,
+                "venue_name": venue_name,
+                "venue_image_link": venue_image_link,
+                "start_time": start_time
+            }
+            for venue_id, venue_name, venue_image_link, start_time in shows
+        ]
+    }
+
+
+def split_shows(detail, current_datetime):
+    """Return a copy of a detail payload with its shows split at ``current_datetime``.
+
+    The payload itself is left untouched so it can be shared through the cache.
+    """
+    shows = detail['shows']
+    boundary = bisect_right([show['start_time'] for show in shows], current_datetime)
+    data = {key: value for key, value in detail.items() if key != 'shows'}
+    data['past_shows'] = shows[:boundary]
+    data['upcoming_shows'] = shows[boundary:]
+    data['past_shows_count'] = boundary
+    data['upcoming_shows_count'] = len(shows) - boundary
+    return data
+
+
+# ----------------------------------------------------------------------------#
+# Shows.
+# ----------------------------------------------------------------------------#
+def encode_cursor(start_time, show_id):
+    return f"{start_time.isoformat()}_{show_id}"
+
+
+def decode_cursor(cursor):
+    """Split a ``/shows`` cursor into ``(start_time, id)``, raising ValueError if malformed."""
+    start_time, _, show_id = cursor.rpartition('_')
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+def decode_range(start, end):
+    """Parse the ISO 8601 ``?from=&to=`` bounds of ``/shows``, raising ValueError if malformed.
+
+    Either may be empty. A bare date means midnight, so ``to=2026-10-19`` stops
+    before that day.
+    """
+    start = datetime.fromisoformat(start) if start else None
+    end = datetime.fromisoformat(end) if end else None
+    if start is not None and end is not None and end < start:
+        raise ValueError('The range ends before it starts.')
+    return start, end
+
+
+# Columns a show can be listed with, the id and start time carry the cursor
+show_columns = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+# Columns rendered by pages/shows.html
+show_page_fields = ('venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time')
+
+
+def show_page(current_datetime, after=None, limit=30, fields=show_page_fields, start=None, end=None):
+    """Return one keyset page of shows ordered by ``(start_time, id)``.
+
+    Only the shows starting in ``[start, end)`` are listed, either bound being
+    optional. Without ``start`` or a cursor the page starts at ``current_datetime``,
+    so only upcoming shows are listed. Only the ``fields`` columns of
+    ``show_columns`` are selected, joining the venue and artist tables only when one
+    of their columns is, and the page is found by seeking the ``(start_time, id)``
+    order rather than with an offset.
+    Returns ``(shows, next_cursor)`` where ``next_cursor`` is None on the last page.
+    """
+    selected = dict.fromkeys(('id', 'start_time') + tuple(fields))
+    query = db.session.query(*(show_columns[field].label(field) for field in selected))
+    if any(field.startswith('venue_') and field != 'venue_id' for field in selected):
+        query = query.join(Venue, Venue.id == Show.venue_id)
+    if any(field.startswith('artist_') and field != 'artist_id' for field in selected):
+        query = query.join(Artist, Artist.id == Show.artist_id)
+    # The range is a bounded walk of the (start_time, id) index, and prunes the partitions
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    elif after is None:
+        query = query.filter(Show.start_time > current_datetime)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    if after is not None:
+        # The row comparison does not prune partitions, the start time bound does
+        query = query.filter(Show.start_time >= after[0], tuple_(Show.start_time, Show.id) > tuple_(*after))
+    rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+    shows = [{field: row._mapping[field] for field in fields} for row in rows]
+    return shows, next_cursor
+
+
+# ----------------------------------------------------------------------------#
+# Venue and artist columns.
+# ----------------------------------------------------------------------------#
+def catalog_columns(model):
+    """Map the column names of ``model`` to its columns, its show counters included."""
+    return {column.key: getattr(model, column.key) for column in model.__table__.columns}
+
+
+def catalog_page(model, fields, after=None, limit=30, conditions=()):
+    """Return one page of ``model`` rows in id order, holding only the ``fields`` columns.
+
+    ``after`` is the id of the last row of the previous page, and only the rows
+    matching ``conditions`` are listed. Returns ``(rows, next_after)`` where
+    ``next_after`` is None on the last page.
+    """
+    columns = catalog_columns(model)
+    selected = dict.fromkeys(('id',) + tuple(fields))
+    query = db.session.query(*(columns[field] for field in selected)).filter(*conditions)
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(limit + 1).all()
+
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = rows[-1].id
+    return [{field: row._mapping[field] for field in fields} for row in rows], next_after
+
+
+def catalog_row(model, row_id, fields):
+    """Return the ``fields`` columns of one ``model`` row, or None if it does not exist."""
+    columns = catalog_columns(model)
+    row = db.session.query(*(columns[field] for field in fields)).filter(model.id == row_id).first()
+    if row is None:
+        return None
+    return dict(row._mapping)
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from cache import detail_cache, venue_key, artist_key
+from models import db, Artist, Venue
+from routing import engines
+
+
+# ----------------------------------------------------------------------------#
+# Query budgets.
+# ----------------------------------------------------------------------------#
+def query_budget(max_queries, seq_scans=()):
+    """Declare the most SQL statements a view may issue for one request.
+
+    Place it below ``@app.route``. ``flask check-query-budgets`` requests every
+    view carrying a budget and fails when one issues more statements.
+    ``seq_scans`` names the tables the view reads in full by design, which
+    ``flask check-query-plans`` accepts sequential scans of.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        view.allowed_seq_scans = frozenset(seq_scans)
+        return view
+    return decorator
+
+
+@contextmanager
+def record_queries(*engines):
+    """Collect the ``(statement, parameters)`` executed on ``engines`` inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _sample_values(app):
+    # Route arguments are filled with rows of the seeded database
+    with app.app_context():
+        values = {
+            'venue_id': db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar(),
+            'artist_id': db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar(),
+            # The largest export
+            'kind': 'shows',
+            'format': 'csv'
+        }
+        db.session.close()
+    return values
+
+
+def check_query_budgets(app, search_term='a'):
+    """Request every budgeted route once and record the statements it issues.
+
+    Runs against the configured database, which must hold at least one venue and
+    one artist. Search routes are posted ``search_term``. The detail cache entries
+    of the sampled venue and artist are dropped before every request, so each
+    route is measured cold whatever ran before it. Returns one
+    ``(rule, method, status_code, view, statements)`` tuple per request.
+    """
+    values = _sample_values(app)
+    if None in values.values():
+        raise RuntimeError('The database needs at least one venue and one artist, seed it first.')
+
+    client = app.test_client()
+    results = []
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if getattr(view, 'query_budget', None) is None:
+            continue
+        url = app.url_map.bind('localhost').build(
+            rule.endpoint, {argument: values[argument] for argument in rule.arguments}
+        )
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            with app.app_context():
+                app_engines = engines()
+            detail_cache.delete(venue_key(values['venue_id']), artist_key(values['artist_id']))
+            with record_queries(*app_engines) as statements:
+                if method == 'POST':
+                    response = client.post(url, data={'search_term': search_term})
+                else:
+                    response = client.get(url)
+                # Streamed responses only query while their body is read
+                response.get_data()
+            results.append((str(rule), method, response.status_code, view, list(statements)))
+    return results
@@ -0,0 +1,116 @@
+import random
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import orm
+
+# Requests from a client which wrote less than REPLICA_PIN_SECONDS ago carry this
+# cookie, holding the time until which they read from the primary
+pin_cookie = 'fyyur_primary_until'
+
+
+# ----------------------------------------------------------------------------#
+# Routing session.
+# ----------------------------------------------------------------------------#
+# Replicas are the SQLALCHEMY_BINDS whose key starts with "replica". No model is
+# bound to them, they are only picked by RoutingSession for read requests.
+
+def replica_binds(app):
+    return sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or () if key.startswith('replica'))
+
+
+def engines(app=None):
+    """Return the primary engine followed by the replica engines of ``app``."""
+    app = app or current_app
+    db = app.extensions['sqlalchemy'].db
+    return [db.get_engine(app)] + [db.get_engine(app, bind=key) for key in replica_binds(app)]
+
+
+class RoutingSession(SignallingSession):
+    """Session reading from the replica ReplicaRouter picked for the request.
+
+    Flushes always go to the primary, outside of requests and for requests routed to
+    the primary every statement does.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_request_context():
+            bind_key = g.get('replica_bind')
+            if bind_key is not None:
+                return self.db.get_engine(self.app, bind=bind_key)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+# ----------------------------------------------------------------------------#
+# Router.
+# ----------------------------------------------------------------------------#
+def read_only(view):
+    """Route a view answering other methods than GET, like a search POST, to a replica."""
+    view.read_only = True
+    return view
+
+
+def writes(view):
+    """Route a view answering GET, like a delete link, to the primary."""
+    view.read_only = False
+    return view
+
+
+class ReplicaRouter:
+    """Send read requests to a random replica and everything else to the primary.
+
+    GET and HEAD requests read from a replica unless their view is marked with
+    ``@writes``, other methods only when it is marked with ``@read_only``. A client
+    stays on the primary for ``REPLICA_PIN_SECONDS`` after a write so the page it is
+    redirected to shows its own changes, whatever the replication lag. Nothing
+    changes while ``SQLALCHEMY_BINDS`` has no replica.
+
+    Detail pages cached from a lagging replica stay stale until their
+    ``DETAIL_CACHE_TTL``, so the lag should stay well below it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.replicas = replica_binds(app)
+        if not self.replicas:
+            return
+        app.before_request(self._route)
+        app.after_request(self._pin)
+
+    def _reads(self):
+        view = self.app.view_functions.get(request.endpoint)
+        return getattr(view, 'read_only', request.method in ('GET', 'HEAD'))
+
+    def _pinned(self):
+        try:
+            return float(request.cookies.get(pin_cookie, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _route(self):
+        if self._reads() and not self._pinned():
+            g.replica_bind = random.choice(self.replicas)
+
+    def _pin(self, response):
+        if request.endpoint is not None and not self._reads():
+            seconds = self.app.config['REPLICA_PIN_SECONDS']
+            response.set_cookie(pin_cookie, str(time.time() + seconds), max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,175 @@
+import re
+
+from sqlalchemy import DDL, event, func, or_, select, text
+
+from forms import genre_choices
+from models import db, Artist, Venue
+
+
+# ----------------------------------------------------------------------------#
+# Search backends.
+# ----------------------------------------------------------------------------#
+# Every backend builds the statement of ranked (id, name, upcoming_shows_count,
+# total) rows, where total is the number of matches before the limit was applied.
+# Statements rather than rows are returned so the async views can run them too.
+
+def _escape_like(term):
+    return re.sub(r'([\\%_])', r'\\\1', term)
+
+
+def _matching_genres(term):
+    # Genres are stored as a bitmask, so a term is matched against the known genre
+    # names up front and the rows are filtered on their bits, each test served by
+    # the partial index of its bit
+    lowered = term.lower()
+    return [value for value, label in genre_choices if value.lower().startswith(lowered)]
+
+
+def _postgresql_matches(model, term, limit):
+    # The trigram GIN indexes on name and city serve ILIKE '%term%' as an index
+    # scan, and similarity() ranks the closest names first
+    pattern = f'%{_escape_like(term)}%'
+    conditions = [
+        model.name.ilike(pattern, escape='\\'),
+        model.city.ilike(pattern, escape='\\')
+    ]
+    genres = _matching_genres(term)
+    if genres:
+        conditions.append(model.genres.has_any(genres))
+    rank = func.greatest(
+        func.similarity(model.name, term),
+        func.similarity(model.city, term) * 0.5
+    )
+    return select(model.id, model.name, model.upcoming_shows_count,
+                  func.count().over().label('total')) \
+        .where(or_(*conditions)) \
+        .order_by(rank.desc(), model.name, model.id) \
+        .limit(limit)
+
+
+def _fts_query(term):
+    # Quote every word so user input cannot inject FTS5 syntax, and match each one
+    # as a prefix
+    return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', term))
+
+
+def _sqlite_matches(model, term, limit):
+    query = _fts_query(term)
+    if not query:
+        # Nothing tokenizable, e.g. "&", so there is nothing for FTS5 to match
+        return _ilike_matches(model, term, limit)
+    table = model.__tablename__
+    return text(
+        f'SELECT {table}.id, {table}.name, {table}.upcoming_shows_count, count(*) OVER () AS total '
+        f'FROM (SELECT rowid, bm25({table}_fts) AS score FROM {table}_fts '
+        f'WHERE {table}_fts MATCH :query) AS matches '
+        f'JOIN {table} ON {table}.id = matches.rowid '
+        f'ORDER BY matches.score, {table}.name, {table}.id '
+        f'LIMIT :limit'
+    ).bindparams(query=query, limit=limit)
+
+
+def _ilike_matches(model, term, limit):
+    pattern = f'%{_escape_like(term)}%'
+    return select(model.id, model.name, model.upcoming_shows_count,
+                  func.count().over().label('total')) \
+        .where(or_(model.name.ilike(pattern, escape='\\'), model.city.ilike(pattern, escape='\\'))) \
+        .order_by(model.name, model.id) \
+        .limit(limit)
+
+
+def _all_matches(model, limit):
+    return select(model.id, model.name, model.upcoming_shows_count,
+                  func.count().over().label('total')) \
+        .order_by(model.name, model.id) \
+        .limit(limit)
+
+
+search_backends = {
+    'postgresql': _postgresql_matches,
+    'sqlite': _sqlite_matches
+}
+
+
+def search_query(model, term, limit, dialect_name):
+    """Return the statement of the best ``limit`` ``model`` rows matching ``term``."""
+    term = term.strip()
+    if not term:
+        # An empty search lists everything, like the original ILIKE '%%' did
+        return _all_matches(model, limit)
+    backend = search_backends.get(dialect_name, _ilike_matches)
+    return backend(model, term, limit)
+
+
+def search_results(rows):
+    """Build the response of the search templates from the rows of ``search_query()``."""
+    return {
+        "count": rows[0][3] if rows else 0,
+        "data": [
+            {
+                "id": row_id,
+                "name": name,
+                "num_upcoming_shows": num_upcoming_shows
+            }
+            for row_id, name, num_upcoming_shows, total in rows
+        ]
+    }
+
+
+def _search(model, term, limit):
+    rows = db.session.execute(search_query(model, term, limit, db.engine.dialect.name)).all()
+    return search_results(rows)
+
+
+def search_venues(term, limit=50):
+    """Return the best ``limit`` venues matching ``term`` by name, city or genre."""
+    return _search(Venue, term, limit)
+
+
+def search_artists(term, limit=50):
+    """Return the best ``limit`` artists matching ``term`` by name, city or genre."""
+    return _search(Artist, term, limit)
+
+
+# ----------------------------------------------------------------------------#
+# SQLite FTS5 index.
+# ----------------------------------------------------------------------------#
+# Local databases built with db.create_all() get an external content FTS5 table per
+# searchable model, kept in sync by triggers. Postgres uses the trigram indexes
+# declared on the models instead. Genres are indexed by name, read from the genre
+# table for the bits of the genre mask, in bit order so a delete removes exactly
+# the tokens its insert added.
+
+def _genre_names(row):
+    return (f"(SELECT group_concat(name, ' ') FROM "
+            f"(SELECT name FROM genre WHERE {row}.genres & genre.mask ORDER BY genre.mask))")
+
+
+def _register_fts(model):
+    table = model.__tablename__
+    columns = 'name, city, genres'
+    new_values = f"new.name, new.city, {_genre_names('new')}"
+    old_values = f"old.name, old.city, {_genre_names('old')}"
+    statements = [
+        f"CREATE VIRTUAL TABLE {table}_fts USING fts5({columns}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {table}_fts({table}_fts, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {table}_fts_update AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {table}_fts({table}_fts, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+    for statement in statements:
+        event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(
+        model.__table__, 'before_drop',
+        DDL(f'DROP TABLE IF EXISTS {table}_fts').execute_if(dialect='sqlite')
+    )
+
+
+_register_fts(Venue)
+_register_fts(Artist)
@@ -0,0 +1,173 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import counters
+from conditional import bump
+from forms import genre_choices, state_choices
+from models import db, Artist, Show, Venue
+
+# ----------------------------------------------------------------------------#
+# Reference data.
+# ----------------------------------------------------------------------------#
+# Cities of the most populated states, the other states get a generic city. States
+# and cities are both drawn with a Zipf-like skew so a few areas hold most rows.
+cities_by_state = {
+    'CA': ['Los Angeles', 'San Francisco', 'San Diego', 'San Jose', 'Oakland', 'Sacramento'],
+    'TX': ['Houston', 'Austin', 'Dallas', 'San Antonio', 'Fort Worth'],
+    'NY': ['New York', 'Brooklyn', 'Buffalo', 'Rochester'],
+    'FL': ['Miami', 'Orlando', 'Tampa', 'Jacksonville'],
+    'IL': ['Chicago', 'Springfield', 'Peoria'],
+    'PA': ['Philadelphia', 'Pittsburgh'],
+    'OH': ['Columbus', 'Cleveland', 'Cincinnati'],
+    'GA': ['Atlanta', 'Savannah'],
+    'NC': ['Charlotte', 'Raleigh', 'Asheville'],
+    'MI': ['Detroit', 'Ann Arbor'],
+    'WA': ['Seattle', 'Spokane', 'Tacoma'],
+    'TN': ['Nashville', 'Memphis', 'Knoxville'],
+    'LA': ['New Orleans', 'Baton Rouge'],
+    'CO': ['Denver', 'Boulder'],
+    'OR': ['Portland', 'Eugene'],
+}
+
+# Relative popularity of each genre, in the order of forms.genre_choices
+genre_weights = [8, 5, 3, 6, 7, 4, 3, 8, 4, 2, 6, 2, 9, 4, 5, 3, 7, 4, 2]
+
+name_prefixes = ['The', 'Old', 'Blue', 'Golden', 'Velvet', 'Electric', 'Midnight', 'Silver', 'Red',
+                 'Wild', 'Lucky', 'Crooked', 'Little', 'Grand', 'Neon', 'Rusty', 'Hollow', 'Sunset']
+venue_nouns = ['Hall', 'Lounge', 'Room', 'Tavern', 'Theater', 'Club', 'Cellar', 'Stage', 'Garden',
+               'Ballroom', 'Warehouse', 'Saloon', 'Pavilion', 'Music & Coffee', 'Hop']
+artist_nouns = ['Band', 'Trio', 'Collective', 'Orchestra', 'Quartet', 'Sound', 'Project',
+                'Brothers', 'Sisters', 'Experience', 'Revue', 'Ensemble', 'Petals', 'Sax Band']
+street_names = ['Main St', 'Oak Ave', 'Market St', 'Broadway', 'Elm St', '2nd Ave', 'Pine St',
+                'Mission St', 'Sunset Blvd', 'Lake Dr']
+
+
+def _zipf_weights(count):
+    # Cumulative weights, which random.choices() does not have to recompute per draw
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+class Generator:
+    """Deterministic generator of realistic venue, artist and show rows."""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        states = [value for value, label in state_choices]
+        # Put the states with known cities first so they get the largest weights
+        states.sort(key=lambda state: (state not in cities_by_state, state))
+        self.states = states
+        self.state_weights = _zipf_weights(len(states))
+        self.city_weights = {state: _zipf_weights(len(cities)) for state, cities in cities_by_state.items()}
+        self.genres = [value for value, label in genre_choices]
+        self.genre_weights = list(accumulate(genre_weights))
+
+    def location(self):
+        state = self.random.choices(self.states, cum_weights=self.state_weights)[0]
+        if state not in cities_by_state:
+            return f'{state} City', state
+        city = self.random.choices(cities_by_state[state], cum_weights=self.city_weights[state])[0]
+        return city, state
+
+    def genre_list(self):
+        count = self.random.choices([1, 2, 3], cum_weights=[5, 8, 10])[0]
+        genres = set()
+        while len(genres) < count:
+            genres.add(self.random.choices(self.genres, cum_weights=self.genre_weights)[0])
+        return sorted(genres)
+
+    def phone(self):
+        return f'{self.random.randint(200, 999)}-{self.random.randint(200, 999)}-{self.random.randint(0, 9999):04d}'
+
+    def name(self, nouns, index):
+        # The index keeps names unique enough to be told apart in search results
+        return f'{self.random.choice(name_prefixes)} {self.random.choice(nouns)} {index}'
+
+    def venue(self, index):
+        city, state = self.location()
+        return {
+            'name': self.name(venue_nouns, index),
+            'city': city,
+            'state': state,
+            'address': f'{self.random.randint(1, 9999)} {self.random.choice(street_names)}',
+            'phone': self.phone(),
+            'image_link': f'https://images.example.com/venues/{index}.jpg',
+            'facebook_link': f'https://www.facebook.com/venue{index}',
+            'website': f'https://venue{index}.example.com',
+            'seeking_talent': self.random.random() < 0.4,
+            'seeking_description': 'We are on the lookout for local artists.',
+            'genres': self.genre_list()
+        }
+
+    def artist(self, index):
+        city, state = self.location()
+        return {
+            'name': self.name(artist_nouns, index),
+            'city': city,
+            'state': state,
+            'phone': self.phone(),
+            'image_link': f'https://images.example.com/artists/{index}.jpg',
+            'facebook_link': f'https://www.facebook.com/artist{index}',
+            'website': f'https://artist{index}.example.com',
+            'seeking_venue': self.random.random() < 0.3,
+            'seeking_description': 'Looking for shows to perform at.',
+            'genres': self.genre_list()
+        }
+
+    def show(self, venue_ids, artist_ids, now):
+        # Two years of history for every year of upcoming shows, on the hour
+        offset = self.random.uniform(-730, 365)
+        start_time = (now + timedelta(days=offset)).replace(minute=0, second=0, microsecond=0)
+        return {
+            'venue_id': self.random.choice(venue_ids),
+            'artist_id': self.random.choice(artist_ids),
+            'start_time': start_time
+        }
+
+
+# ----------------------------------------------------------------------------#
+# Seeding.
+# ----------------------------------------------------------------------------#
+def _insert(table, rows_iterator, total, batch_size, progress):
+    batch = []
+    inserted = 0
+    for row in rows_iterator:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            inserted += len(batch)
+            progress(table.name, inserted, total)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        inserted += len(batch)
+        progress(table.name, inserted, total)
+
+
+def seed_database(venues=10000, artists=100000, shows=1000000, seed=0, batch_size=10000,
+                  progress=lambda table, done, total: None):
+    """Insert ``venues``, ``artists`` and ``shows`` generated rows into the database.
+
+    Rows are generated and inserted in batches of ``batch_size``, so memory only
+    grows with the ids of the venues and artists shows are drawn from. The same
+    ``seed`` always generates the same rows. Must run inside an app context.
+    """
+    generator = Generator(seed)
+    now = datetime.now()
+    _insert(Venue.__table__, (generator.venue(index) for index in range(venues)),
+            venues, batch_size, progress)
+    _insert(Artist.__table__, (generator.artist(index) for index in range(artists)),
+            artists, batch_size, progress)
+
+    venue_ids = [row[0] for row in db.session.query(Venue.id)]
+    artist_ids = [row[0] for row in db.session.query(Artist.id)]
+    if shows and venue_ids and artist_ids:
+        _insert(Show.__table__, (generator.show(venue_ids, artist_ids, now) for index in range(shows)),
+                shows, batch_size, progress)
+
+    # The inserts bypassed the ORM flush hooks, the show counters are recounted
+    counters.check(db.session.connection(), repair=True)
+    bump(db.session.connection(), 'venue', 'artist', 'show')
+    db.session.commit()
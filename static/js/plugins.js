@@ -18,3 +18,22 @@ window.log = function(){
 
 // place any jQuery/helper plugins in here, instead of separate, slower script files.
 
+
+// Typeahead of the venue and artist id fields: the names starting with the typed
+// text are fetched from the URL in data-typeahead and offered through the datalist
+// of the field, their ids as values.
+$(document).on('input', 'input[data-typeahead]', function() {
+  var input = $(this);
+  var term = input.val();
+  clearTimeout(input.data('typeaheadTimer'));
+  // An id typed in directly needs no suggestion
+  if (!term || /^\d+$/.test(term)) return;
+  input.data('typeaheadTimer', setTimeout(function() {
+    $.getJSON(input.data('typeahead'), {q: term}, function(response) {
+      var options = $('#' + input.attr('list')).empty();
+      $.each(response.data, function(index, row) {
+        options.append($('<option>').attr('value', row.id).text(row.name));
+      });
+    });
+  }, 100));
+});
@@ -0,0 +1,208 @@
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models import db, Artist, TableVersion, Venue
+
+# Models offered by the typeahead, by table name
+models = {'venue': Venue, 'artist': Artist}
+
+
+# ----------------------------------------------------------------------------#
+# Prefix index.
+# ----------------------------------------------------------------------------#
+def normalize(text):
+    """Fold ``text`` for matching: no accents, case folded, words split by single spaces."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return ' '.join(re.findall(r'[^\W_]+', folded))
+
+
+def _keys(name):
+    # A name is found from the start of any of its words, "Guns N Petals" from
+    # "pet" as well as from "gun"
+    words = normalize(name).split(' ')
+    return sorted({' '.join(words[index:]) for index in range(len(words)) if words[index]})
+
+
+class PrefixIndex:
+    """Sorted array of the normalized names of one model, searched by binary search.
+
+    Every name is stored once per word it holds, as the suffix starting at that
+    word, next to its row id in a parallel integer array. Updates insert into and
+    delete from both arrays in place.
+    """
+
+    def __init__(self, rows=()):
+        entries = sorted((key, row_id) for row_id, name in rows for key in _keys(name))
+        self._keys = [key for key, row_id in entries]
+        self._ids = array('q', (row_id for key, row_id in entries))
+        self.names = {row_id: name for row_id, name in rows}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _remove(self, row_id):
+        name = self.names.pop(row_id, None)
+        if name is None:
+            return
+        for key in _keys(name):
+            index = bisect_left(self._keys, key)
+            while self._ids[index] != row_id:
+                index += 1
+            del self._keys[index]
+            del self._ids[index]
+
+    def add(self, row_id, name):
+        """Add the row ``row_id`` named ``name``, replacing its earlier name."""
+        with self._lock:
+            self._remove(row_id)
+            self.names[row_id] = name
+            for key in _keys(name):
+                index = bisect_left(self._keys, key)
+                self._keys.insert(index, key)
+                self._ids.insert(index, row_id)
+
+    def remove(self, row_id):
+        with self._lock:
+            self._remove(row_id)
+
+    def search(self, prefix, limit=10):
+        """Return up to ``limit`` ``(id, name)`` of the names with a word starting with ``prefix``.
+
+        Names come in the alphabetical order of their suffix matching ``prefix``.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = {}
+        with self._lock:
+            index = bisect_left(self._keys, prefix)
+            while index < len(self._keys) and len(results) < limit and self._keys[index].startswith(prefix):
+                row_id = self._ids[index]
+                results.setdefault(row_id, self.names[row_id])
+                index += 1
+        return list(results.items())
+
+
+# ----------------------------------------------------------------------------#
+# Extension.
+# ----------------------------------------------------------------------------#
+class Typeahead:
+    """In-process prefix indexes of the venue and artist names.
+
+    Each index is loaded on its first search. Venues and artists created, renamed or
+    deleted through this process are applied to it once committed. Changes made by
+    other workers, imports and bulk deletes bump the table versions, which searches
+    compare at most every ``TYPEAHEAD_REFRESH_SECONDS``, in a background thread that
+    reloads the index when they moved. Searches themselves issue no SQL.
+    """
+
+    def __init__(self, app=None):
+        self.indexes = {}
+        self._versions = {}
+        self._checked_at = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+    def _load(self, table):
+        # Versions first, a row committed in between only triggers another reload
+        model = models[table]
+        with db.engine.connect() as connection:
+            version = connection.execute(
+                select(TableVersion.version).where(TableVersion.name == table)
+            ).scalar()
+            rows = connection.execute(select(model.id, model.name)).all()
+        return version, PrefixIndex(rows)
+
+    def _refresh(self, table):
+        try:
+            with self.app.app_context():
+                with db.engine.connect() as connection:
+                    version = connection.execute(
+                        select(TableVersion.version).where(TableVersion.name == table)
+                    ).scalar()
+                if version != self._versions.get(table):
+                    self._versions[table], self.indexes[table] = self._load(table)
+        finally:
+            with self._lock:
+                self._refreshing.discard(table)
+
+    def index(self, table):
+        """Return the index of ``table``, loading it on first use."""
+        index = self.indexes.get(table)
+        if index is None:
+            with self._lock:
+                if table not in self.indexes:
+                    self._versions[table], self.indexes[table] = self._load(table)
+                    self._checked_at[table] = time.monotonic()
+            return self.indexes[table]
+
+        now = time.monotonic()
+        if now - self._checked_at[table] >= self.app.config['TYPEAHEAD_REFRESH_SECONDS']:
+            with self._lock:
+                start = table not in self._refreshing
+                self._refreshing.add(table)
+                self._checked_at[table] = now
+            if start:
+                threading.Thread(target=self._refresh, args=(table,), daemon=True).start()
+        return index
+
+    def search(self, table, prefix, limit=10):
+        return self.index(table).search(prefix, limit)
+
+    def apply(self, table, row_id, name):
+        """Apply a committed change of ``table``, ``name`` None for a deleted row."""
+        index = self.indexes.get(table)
+        if index is None:
+            return
+        if name is None:
+            index.remove(row_id)
+        else:
+            index.add(row_id, name)
+
+
+typeahead = Typeahead()
+
+
+# ----------------------------------------------------------------------------#
+# Session hooks.
+# ----------------------------------------------------------------------------#
+# Changes are collected at every flush and applied on commit, so a rolled back
+# transaction never reaches the indexes.
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(flush_session, flush_context):
+    changes = flush_session.info.setdefault('typeahead_changes', [])
+    for instance in flush_session.new:
+        if instance.__table__.name in models:
+            changes.append((instance.__table__.name, instance.id, instance.name))
+    for instance in flush_session.dirty:
+        if instance.__table__.name in models and inspect(instance).attrs.name.history.has_changes():
+            changes.append((instance.__table__.name, instance.id, instance.name))
+    for instance in flush_session.deleted:
+        if instance.__table__.name in models:
+            changes.append((instance.__table__.name, instance.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(committed_session):
+    for table, row_id, name in committed_session.info.pop('typeahead_changes', ()):
+        typeahead.apply(table, row_id, name)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(rolled_back_session, previous_transaction):
+    rolled_back_session.info.pop('typeahead_changes', None)